@@ -0,0 +1,318 @@
+"""
+Microbenchmarks for the CRUD and serialization layer.
+
+Seed a database once, then run the suite against it:
+
+    python -m benchmarks.crud seed --agents 10000 --messages 10000000
+    python -m benchmarks.crud run --seconds 5 --output before.json
+
+The database is the one in DATABASE_URL. Seeded rows belong to a dedicated
+benchmark user and are reused across runs, so numbers from two commits are
+comparable; the benchmarks that write roll their changes back. Each benchmark
+reports ops/sec and latency percentiles from a timed pass, then the allocations
+per operation from a shorter pass under tracemalloc.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable
+
+from sqlalchemy import func, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.stats import summarize
+from src.db.crud import Database, AgentCRUD, MessageCRUD
+from src.db.model.agent import Agent, AgentUpdate
+from src.db.model.chat import Chat
+from src.db.model.message import Message, MessageRole
+from src.db.model.platform import Platform, PlatformID, platform_dict
+from src.db.model.user import User
+from src.db.session import async_session, engine, init_db
+
+BENCH_EMAIL = "benchmark@example.com"
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant for a small online store. Answer questions about orders, "
+    "shipping and returns politely and concisely, and ask for the order number when needed. "
+) * 3
+
+
+@dataclass
+class Fixture:
+    user_id: int
+    agent_ids: list[int]
+    chat_ids: list[int]
+    agent: Agent
+
+
+async def _insert_batches(session: AsyncSession, model: type, rows: Callable[[int], dict], total: int, batch_size: int) -> None:
+    for start in range(0, total, batch_size):
+        batch = [rows(i) for i in range(start, min(start + batch_size, total))]
+        await session.exec(insert(model).values(batch))
+        await session.commit()
+        if total > batch_size:
+            print(f"  {model.__tablename__}: {start + len(batch)}/{total}", end="\r", flush=True)
+    if total > batch_size:
+        print()
+
+
+async def seed(args: argparse.Namespace) -> None:
+    """
+    Insert the benchmark user, agents, chats and messages, skipping what already exists.
+    """
+    await init_db()
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+
+    async with async_session() as session:
+        for platform_id, name in platform_dict.items():
+            if await session.get(Platform, platform_id.value) is None:
+                session.add(Platform(id=platform_id.value, name=name))
+        user = (await session.exec(select(User).where(User.email == BENCH_EMAIL))).first()
+        if user is None:
+            user = User(email=BENCH_EMAIL, password="not-a-real-hash")
+            session.add(user)
+        await session.commit()
+        await session.refresh(user)
+
+        agents = (await session.exec(select(func.count()).select_from(Agent).where(Agent.user_id == user.id))).one()
+        if agents < args.agents:
+            print(f"Seeding {args.agents - agents} agents")
+            await _insert_batches(session, Agent, lambda i: {
+                "user_id": user.id,
+                "name": f"Benchmark agent {agents + i}",
+                "system_prompt": SYSTEM_PROMPT,
+                "disabled": (agents + i) % 20 == 0,
+                "response_cache_enabled": False,
+                "tokens": [{
+                    "platform_id": PlatformID.TELEGRAM.value,
+                    "platform_name": "telegram",
+                    "token": f"{agents + i}:{rng.randbytes(16).hex()}",
+                }],
+                "created_at": now,
+            }, args.agents - agents, args.batch_size)
+
+        agent_ids = (await session.exec(select(Agent.id).where(Agent.user_id == user.id).order_by(Agent.id))).all()
+        chats = (await session.exec(select(func.count()).select_from(Chat).where(Chat.user_id == user.id))).one()
+        if chats < args.chats:
+            print(f"Seeding {args.chats - chats} chats")
+            await _insert_batches(session, Chat, lambda i: {
+                "external_chat_id": 800_000_000 + chats + i,
+                "user_id": user.id,
+                "agent_id": agent_ids[(chats + i) % len(agent_ids)],
+                "platform_id": PlatformID.TELEGRAM.value,
+                "created_at": now,
+            }, args.chats - chats, args.batch_size)
+
+        chat_ids = (await session.exec(select(Chat.id).where(Chat.user_id == user.id).order_by(Chat.id))).all()
+        messages = (await session.exec(
+            select(func.count()).select_from(Message).where(Message.chat_id.in_(select(Chat.id).where(Chat.user_id == user.id)))
+        )).one()
+        if messages < args.messages:
+            print(f"Seeding {args.messages - messages} messages")
+            start = now - timedelta(seconds=args.messages)
+            await _insert_batches(session, Message, lambda i: {
+                "chat_id": rng.choice(chat_ids),
+                "text": f"Benchmark message {messages + i} about order {rng.randrange(100_000)}",
+                "client_name": "benchmark",
+                "role": MessageRole.CLIENT if i % 2 == 0 else MessageRole.AGENT,
+                "created_at": start + timedelta(seconds=i),
+            }, args.messages - messages, args.batch_size)
+
+    print("Seed complete")
+
+
+async def load_fixture() -> Fixture:
+    async with async_session() as session:
+        user = (await session.exec(select(User).where(User.email == BENCH_EMAIL))).first()
+        if user is None:
+            raise SystemExit("No benchmark data found, run `python -m benchmarks.crud seed` first")
+        agent_ids = (await session.exec(
+            select(Agent.id).where(Agent.user_id == user.id, Agent.disabled == False)
+        )).all()
+        chat_ids = (await session.exec(select(Chat.id).where(Chat.user_id == user.id))).all()
+        agent = await session.get(Agent, agent_ids[0])
+        return Fixture(user_id=user.id, agent_ids=list(agent_ids), chat_ids=list(chat_ids), agent=agent)
+
+
+Operation = Callable[[], Awaitable[object]]
+
+
+@asynccontextmanager
+async def rolled_back_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session whose writes are undone on exit, so write benchmarks leave the seeded data as it was.
+
+    The engine runs in autocommit mode, so the connection opens a real transaction
+    and the session's commits only release savepoints inside it.
+    """
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="READ COMMITTED")
+        transaction = await conn.begin()
+        try:
+            async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint", expire_on_commit=False) as session:
+                yield session
+        finally:
+            await transaction.rollback()
+
+
+def build_operations(fixture: Fixture, rng: random.Random) -> dict[str, Operation]:
+    """
+    One zero-argument coroutine factory per benchmark. Each call opens its own
+    session, as a request would; writes go through `rolled_back_session`.
+    """
+    names = itertools.count()
+
+    async def database_create():
+        async with rolled_back_session() as session:
+            await Database.create(session, Message(
+                chat_id=rng.choice(fixture.chat_ids),
+                text="Benchmark insert",
+                role=MessageRole.CLIENT,
+            ))
+
+    async def database_get():
+        async with async_session() as session:
+            await Database.get(session, rng.choice(fixture.agent_ids), Agent)
+
+    async def database_update():
+        async with rolled_back_session() as session:
+            await Database.update(session, rng.choice(fixture.agent_ids), AgentUpdate(name=f"Benchmark agent {next(names)}"), Agent)
+
+    async def agent_crud_get():
+        async with async_session() as session:
+            await AgentCRUD.get(session, rng.choice(fixture.agent_ids))
+
+    async def agent_crud_get_all_active_agents():
+        async with async_session() as session:
+            await AgentCRUD.get_all_active_agents(session)
+
+    async def message_crud_get_messages_by_chat_id():
+        async with async_session() as session:
+            await MessageCRUD.get_messages_by_chat_id(session, rng.choice(fixture.chat_ids))
+
+    async def agent_to_read():
+        AgentCRUD.to_read(fixture.agent)
+
+    return {
+        "Database.create": database_create,
+        "Database.get": database_get,
+        "Database.update": database_update,
+        "AgentCRUD.get": agent_crud_get,
+        "AgentCRUD.get_all_active_agents": agent_crud_get_all_active_agents,
+        "MessageCRUD.get_messages_by_chat_id": message_crud_get_messages_by_chat_id,
+        "AgentCRUD.to_read": agent_to_read,
+    }
+
+
+async def measure(operation: Operation, seconds: float, warmup: int, alloc_ops: int) -> dict:
+    for _ in range(warmup):
+        await operation()
+
+    latencies: list[float] = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    while True:
+        op_start = time.perf_counter()
+        await operation()
+        latencies.append(time.perf_counter() - op_start)
+        if op_start >= deadline:
+            break
+    elapsed = time.perf_counter() - start
+
+    # Allocation pass: tracemalloc slows everything down, so it is kept out of the timings
+    peaks: list[int] = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(alloc_ops):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        await operation()
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": len(latencies) / elapsed,
+        "latency": summarize(latencies),
+        "alloc_peak_kb_per_op": sum(peaks) / len(peaks) / 1024 if peaks else 0.0,
+        "alloc_retained_blocks_per_op": blocks / alloc_ops if alloc_ops else 0.0,
+    }
+
+
+async def run(args: argparse.Namespace) -> dict:
+    fixture = await load_fixture()
+    operations = build_operations(fixture, random.Random(args.seed))
+    selected = args.only or list(operations)
+
+    results = {}
+    for name in selected:
+        print(f"Running {name}...", flush=True)
+        results[name] = await measure(operations[name], args.seconds, args.warmup, args.alloc_ops)
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "dataset": {"agents": len(fixture.agent_ids), "chats": len(fixture.chat_ids)},
+        "benchmarks": results,
+    }
+
+
+def print_summary(results: dict) -> None:
+    print(f"{'benchmark':<40} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KB/op':>11} {'blocks/op':>10}")
+    for name, result in results["benchmarks"].items():
+        latency = result["latency"]
+        print(
+            f"{name:<40} {result['ops_per_sec']:>10.1f} {latency['p50_ms']:>9.3f} {latency['p99_ms']:>9.3f} "
+            f"{result['alloc_peak_kb_per_op']:>11.1f} {result['alloc_retained_blocks_per_op']:>10.1f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Insert benchmark data")
+    seed_parser.add_argument("--agents", type=int, default=10_000)
+    seed_parser.add_argument("--chats", type=int, default=100_000)
+    seed_parser.add_argument("--messages", type=int, default=10_000_000)
+    seed_parser.add_argument("--batch-size", type=int, default=5_000)
+    seed_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--seconds", type=float, default=5.0, help="Timed duration per benchmark")
+    run_parser.add_argument("--warmup", type=int, default=20, help="Untimed operations before measuring")
+    run_parser.add_argument("--alloc-ops", type=int, default=20, help="Operations traced for allocations")
+    run_parser.add_argument("--only", nargs="+", default=None, help="Benchmark names to run, default: all")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        if args.command == "seed":
+            await seed(args)
+            return
+        results = await run(args)
+        print_summary(results)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results written to {args.output}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,293 @@
+"""
+End-to-end load generator: synthetic Telegram traffic through chatBot and the backend.
+
+Start the backend with the fake LLM (LLM_PROVIDER=fake) and chatBot with
+TELEGRAM_API_URL pointing at this script's Telegram stand-in, then run:
+
+    python -m benchmarks.loadgen --rate 50 --duration 60 --output results.json
+
+Updates are posted to chatBot's /webhook/{agent_id} as an open-loop Poisson
+process. Chats are picked with a Zipf distribution and some arrivals are
+bursts of several messages. A message's end-to-end latency runs from its
+webhook POST until the stand-in receives the matching sendMessage. The
+backend's /metrics histograms are scraped before and after the run for the
+per-hop breakdown.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+import aiohttp
+
+from benchmarks.stats import Samples, histogram_delta, parse_prometheus, summarize
+from benchmarks.telegram import TelegramStub
+
+HOP_METRICS = (
+    "db_pool_checkout_seconds",
+    "chat_lock_wait_seconds",
+    "agent_node_seconds",
+    "llm_time_to_first_token_seconds",
+    "llm_request_seconds",
+    "checkpoint_operation_seconds",
+    "message_write_flush_seconds",
+)
+
+# Replies chatBot or the backend send when something went wrong
+ERROR_REPLIES = (
+    "I'm sorry, I encountered an error",
+    "Erro",
+    "Não foi possível",
+    "Este agente não está mais disponível",
+)
+
+FIRST_CHAT_ID = 900_000_000
+
+
+@dataclass
+class Sent:
+    chat_id: int
+    sent_at: float
+    acked_at: Optional[float] = None
+    replied_at: Optional[float] = None
+    ack_ok: bool = False
+    reply_ok: bool = False
+    coalesced: bool = False
+
+
+class LoadGenerator:
+    def __init__(self, args: argparse.Namespace, agent_ids: list[int]) -> None:
+        self.args = args
+        self.agent_ids = agent_ids
+        self.rng = random.Random(args.seed)
+        self.sent: list[Sent] = []
+        self.pending: dict[int, deque[Sent]] = {}
+        self.unmatched_replies = 0
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._tasks: set[asyncio.Task] = set()
+        self._started_at = 0.0
+
+        weights = [1 / (rank + 1) ** args.zipf for rank in range(args.chats)]
+        self._chat_weights = list(itertools.accumulate(weights))
+
+    def on_send(self, chat_id: int, text: str, received_at: float) -> None:
+        queue = self.pending.get(chat_id)
+        if not queue:
+            self.unmatched_replies += 1
+            return
+        record = queue.popleft()
+        if not queue:
+            del self.pending[chat_id]
+        record.replied_at = received_at
+        record.reply_ok = not text.startswith(ERROR_REPLIES)
+
+    def _forget(self, record: Sent) -> None:
+        queue = self.pending.get(record.chat_id)
+        if queue and record in queue:
+            queue.remove(record)
+            if not queue:
+                del self.pending[record.chat_id]
+
+    def _pick_chat(self) -> int:
+        rank = self.rng.choices(range(self.args.chats), cum_weights=self._chat_weights)[0]
+        return FIRST_CHAT_ID + rank
+
+    def _update(self, chat_id: int) -> dict:
+        return {
+            "update_id": next(self._update_ids),
+            "message": {
+                "message_id": next(self._message_ids),
+                "chat": {"id": chat_id, "type": "private"},
+                "from_user": {"id": chat_id, "first_name": f"Load {chat_id}"},
+                "text": f"Message {self.rng.randrange(1_000_000)} from chat {chat_id}",
+            },
+        }
+
+    async def _post(self, http: aiohttp.ClientSession, agent_id: int, chat_id: int) -> None:
+        record = Sent(chat_id=chat_id, sent_at=time.perf_counter())
+        self.sent.append(record)
+        self.pending.setdefault(chat_id, deque()).append(record)
+        try:
+            async with http.post(f"{self.args.chatbot_url}/webhook/{agent_id}", json=self._update(chat_id)) as response:
+                body = await response.json(content_type=None)
+                record.ack_ok = response.status < 400 and body.get("status") != "error"
+                if body.get("status") == "coalesced":
+                    # Answered by the reply to a later message of the burst
+                    record.coalesced = True
+                    self._forget(record)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            record.ack_ok = False
+        record.acked_at = time.perf_counter()
+
+    async def _burst(self, http: aiohttp.ClientSession) -> None:
+        chat_id = self._pick_chat()
+        agent_id = self.agent_ids[chat_id % len(self.agent_ids)]
+        size = 1
+        if self.rng.random() < self.args.burst_probability:
+            size = self.rng.randint(2, self.args.burst_max)
+
+        posts = []
+        for i in range(size):
+            if i:
+                await asyncio.sleep(self.rng.expovariate(1000 / self.args.burst_gap_ms))
+            posts.append(asyncio.create_task(self._post(http, agent_id, chat_id)))
+        await asyncio.gather(*posts)
+
+    async def run(self, http: aiohttp.ClientSession) -> float:
+        """
+        Generate arrivals for the configured duration and return the elapsed time.
+        """
+        start = self._started_at = time.perf_counter()
+        deadline = start + self.args.duration
+        next_arrival = start
+        # Bursts count as one arrival, so scale the arrival rate to hit the target message rate
+        mean_burst = 1 + self.args.burst_probability * ((2 + self.args.burst_max) / 2 - 1)
+        arrival_rate = self.args.rate / mean_burst
+
+        while next_arrival < deadline:
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.create_task(self._burst(http))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            next_arrival += self.rng.expovariate(arrival_rate)
+
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=self.args.drain)
+        drain_deadline = time.perf_counter() + self.args.drain
+        while self.pending and time.perf_counter() < drain_deadline:
+            await asyncio.sleep(0.05)
+
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> dict:
+        replied = [r for r in self.sent if r.replied_at is not None]
+        ok = [r for r in replied if r.reply_ok]
+        # Throughput over the span that actually produced replies, not the idle drain tail
+        span = max((r.replied_at for r in ok), default=self._started_at) - self._started_at
+        return {
+            "elapsed_s": elapsed,
+            "sent": len(self.sent),
+            "acked": sum(r.acked_at is not None for r in self.sent),
+            "ack_errors": sum(not r.ack_ok for r in self.sent if r.acked_at is not None),
+            "replied": len(replied),
+            "reply_errors": len(replied) - len(ok),
+            "coalesced": sum(r.coalesced for r in self.sent),
+            "unanswered": sum(r.replied_at is None and not r.coalesced for r in self.sent),
+            "unmatched_replies": self.unmatched_replies,
+            "offered_rps": len(self.sent) / self.args.duration,
+            "throughput_rps": len(ok) / span if span > 0 else 0.0,
+            "latency": {
+                "end_to_end": summarize([r.replied_at - r.sent_at for r in ok]),
+                "webhook_ack": summarize([r.acked_at - r.sent_at for r in self.sent if r.acked_at is not None and r.ack_ok]),
+            },
+        }
+
+
+async def scrape_metrics(http: aiohttp.ClientSession, url: str) -> Optional[Samples]:
+    try:
+        async with http.get(url) as response:
+            response.raise_for_status()
+            return parse_prometheus(await response.text())
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Could not scrape {url}: {e}")
+        return None
+
+
+async def discover_agents(http: aiohttp.ClientSession, chatbot_url: str) -> list[int]:
+    async with http.get(f"{chatbot_url}/agents") as response:
+        response.raise_for_status()
+        agents = await response.json()
+    return sorted(int(agent_id) for agent_id, info in agents.items() if not info.get("disabled"))
+
+
+def print_summary(results: dict) -> None:
+    print(
+        f"sent={results['sent']} replied={results['replied']} reply_errors={results['reply_errors']} "
+        f"coalesced={results['coalesced']} unanswered={results['unanswered']} ack_errors={results['ack_errors']}"
+    )
+    print(f"offered={results['offered_rps']:.1f} msg/s throughput={results['throughput_rps']:.1f} msg/s")
+
+    rows = [(name, stats) for name, stats in results["latency"].items()]
+    for metric, series in results.get("hops", {}).items():
+        rows.extend((f"{metric}[{labels}]", stats) for labels, stats in series.items())
+
+    print(f"{'hop':<60} {'count':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in rows:
+        if not stats.get("count"):
+            continue
+        print(
+            f"{name:<60} {int(stats['count']):>8} {stats['mean_ms']:>9.1f} "
+            f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+        )
+
+
+async def main(args: argparse.Namespace) -> dict:
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as http:
+        agent_ids = args.agents or await discover_agents(http, args.chatbot_url)
+        if not agent_ids:
+            raise SystemExit("No active agents registered in chatBot, pass --agents or create one first")
+
+        generator = LoadGenerator(args, agent_ids)
+        telegram = TelegramStub(args.telegram_host, args.telegram_port, on_send=generator.on_send)
+        await telegram.start()
+        try:
+            metrics_url = f"{args.backend_url}{args.api_prefix}/metrics"
+            before = await scrape_metrics(http, metrics_url)
+            started_at = datetime.now(timezone.utc)
+            elapsed = await generator.run(http)
+            after = await scrape_metrics(http, metrics_url)
+        finally:
+            await telegram.stop()
+
+    results = {
+        "started_at": started_at.isoformat(),
+        "config": {**vars(args), "agents": agent_ids},
+        **generator.report(elapsed),
+    }
+    if before is not None and after is not None:
+        results["hops"] = {name: histogram_delta(before, after, name) for name in HOP_METRICS}
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chatbot-url", default="http://localhost:8001")
+    parser.add_argument("--backend-url", default="http://localhost:8000")
+    parser.add_argument("--api-prefix", default="/api/v1")
+    parser.add_argument("--agents", type=lambda v: [int(a) for a in v.split(",")], help="Comma separated agent ids, default: every agent registered in chatBot")
+    parser.add_argument("--rate", type=float, default=20.0, help="Target messages per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic generation")
+    parser.add_argument("--drain", type=float, default=30.0, help="Seconds to wait for outstanding replies")
+    parser.add_argument("--chats", type=int, default=1000, help="Number of distinct chats")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Chat popularity skew, 0 = uniform")
+    parser.add_argument("--burst-probability", type=float, default=0.2, help="Share of arrivals that are bursts")
+    parser.add_argument("--burst-max", type=int, default=4, help="Largest burst size")
+    parser.add_argument("--burst-gap-ms", type=float, default=300.0, help="Mean gap between messages of a burst")
+    parser.add_argument("--connections", type=int, default=500, help="Max concurrent connections to chatBot")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Webhook request timeout")
+    parser.add_argument("--telegram-host", default="0.0.0.0")
+    parser.add_argument("--telegram-port", type=int, default=8081)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Write the results as JSON to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = asyncio.run(main(args))
+    print_summary(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
@@ -0,0 +1,103 @@
+import math
+import re
+from typing import Iterable
+
+Samples = dict[str, dict[tuple[tuple[str, str], ...], float]]
+
+_SAMPLE_RE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(?P<labels>.*)\})?\s+(?P<value>\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Percentile of `values` (0 <= q <= 100) with linear interpolation.
+    """
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    """
+    Count, mean and tail percentiles of a list of latencies, in milliseconds.
+    """
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+def parse_prometheus(text: str) -> Samples:
+    """
+    Parse Prometheus text exposition into {name: {labels: value}}.
+    """
+    samples: Samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_RE.match(line)
+        if match is None:
+            continue
+        labels = tuple(sorted(_LABEL_RE.findall(match["labels"] or "")))
+        samples.setdefault(match["name"], {})[labels] = float(match["value"])
+    return samples
+
+
+def histogram_delta(before: Samples, after: Samples, name: str) -> dict[str, dict[str, float]]:
+    """
+    Summarize what a histogram recorded between two scrapes, per label set.
+
+    Percentiles are estimated from the bucket counts, so their precision is
+    bounded by the bucket layout.
+    """
+    result: dict[str, dict[str, float]] = {}
+    buckets_after = after.get(f"{name}_bucket", {})
+    buckets_before = before.get(f"{name}_bucket", {})
+
+    series: dict[tuple[tuple[str, str], ...], list[tuple[float, float]]] = {}
+    for labels, value in buckets_after.items():
+        le = dict(labels)["le"]
+        key = tuple(pair for pair in labels if pair[0] != "le")
+        bound = math.inf if le == "+Inf" else float(le)
+        series.setdefault(key, []).append((bound, value - buckets_before.get(labels, 0.0)))
+
+    for key, buckets in series.items():
+        buckets.sort()
+        count = buckets[-1][1]
+        if count <= 0:
+            continue
+        total = after.get(f"{name}_sum", {}).get(key, 0.0) - before.get(f"{name}_sum", {}).get(key, 0.0)
+        label = ",".join(f"{k}={v}" for k, v in key) or "all"
+        result[label] = {
+            "count": count,
+            "mean_ms": total / count * 1000,
+            "p50_ms": _bucket_quantile(buckets, 0.50) * 1000,
+            "p95_ms": _bucket_quantile(buckets, 0.95) * 1000,
+            "p99_ms": _bucket_quantile(buckets, 0.99) * 1000,
+        }
+    return result
+
+
+def _bucket_quantile(buckets: Iterable[tuple[float, float]], q: float) -> float:
+    buckets = list(buckets)
+    target = buckets[-1][1] * q
+    lower_bound, lower_count = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= target:
+            if math.isinf(bound):
+                return lower_bound
+            if cumulative == lower_count:
+                return bound
+            return lower_bound + (bound - lower_bound) * (target - lower_count) / (cumulative - lower_count)
+        lower_bound, lower_count = bound, cumulative
+    return lower_bound
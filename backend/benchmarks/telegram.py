@@ -0,0 +1,59 @@
+import itertools
+import time
+from typing import Callable, Optional
+
+from aiohttp import web
+
+SendCallback = Callable[[int, str, float], None]
+
+
+class TelegramStub:
+    """
+    Local stand-in for the Telegram Bot API.
+
+    Point chatBot's TELEGRAM_API_URL at it. `sendMessage` calls are acknowledged
+    immediately and reported to `on_send`; webhook management calls succeed
+    without doing anything.
+    """
+
+    def __init__(self, host: str, port: int, on_send: Optional[SendCallback] = None) -> None:
+        self.host = host
+        self.port = port
+        self.on_send = on_send
+        self.sent = 0
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        received_at = time.perf_counter()
+        method = request.match_info["method"]
+        if method != "sendMessage":
+            return web.json_response({"ok": True, "result": True})
+
+        body = await request.json()
+        chat_id = int(body["chat_id"])
+        self.sent += 1
+        if self.on_send is not None:
+            self.on_send(chat_id, body.get("text", ""), received_at)
+
+        return web.json_response({
+            "ok": True,
+            "result": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": body.get("text", ""),
+            },
+        })
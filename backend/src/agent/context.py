@@ -0,0 +1,43 @@
+from langchain_core.messages import AnyMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from src.config import settings
+from src.utils.cache import LRUCache
+
+# Message id -> approximate token count; messages are immutable once checkpointed,
+# and history rebuilt from the Message table reuses the row's primary key as id
+token_count_cache: LRUCache[str, int] = LRUCache(max_size=settings.TOKEN_COUNT_CACHE_MAX_SIZE)
+
+
+def count_tokens(message: AnyMessage) -> int:
+    if message.id is None:
+        return count_tokens_approximately([message])
+
+    count = token_count_cache.get(message.id)
+    if count is None:
+        count = count_tokens_approximately([message])
+        token_count_cache.set(message.id, count)
+    return count
+
+
+def split_history(messages: list[AnyMessage], budget: int) -> tuple[list[AnyMessage], list[AnyMessage]]:
+    """
+    Split the history into (old, recent) once it exceeds `budget` tokens.
+
+    Returns no old messages while the history fits. Otherwise `recent` keeps the
+    newest messages up to CONTEXT_KEEP_RATIO of the budget, so compaction runs
+    every few turns rather than on every message. The latest message is always kept.
+    """
+    if budget <= 0 or sum(count_tokens(message) for message in messages) <= budget:
+        return [], messages
+
+    keep_budget = budget * settings.CONTEXT_KEEP_RATIO
+    keep_from = len(messages) - 1
+    total = count_tokens(messages[keep_from])
+    while keep_from > 0:
+        total += count_tokens(messages[keep_from - 1])
+        if total > keep_budget:
+            break
+        keep_from -= 1
+
+    return messages[:keep_from], messages[keep_from:]
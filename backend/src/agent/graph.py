@@ -1,29 +1,76 @@
+import asyncio
+from typing import Hashable, Optional
+
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.state import CompiledStateGraph
-from langgraph.checkpoint.mysql.aio import AIOMySQLSaver
+from langgraph.checkpoint.base import BaseCheckpointSaver
 
 from src.agent.state import AgentState
 from src.agent.nodes import (
     entry_node,
+    compact_node,
     answer_node,
     save_message_node,
     AgentNodes,
 )
+from src.config import settings, get_logger
+from src.db.checkpointer import get_checkpointer
+from src.utils.cache import LRUCache
+
+logger = get_logger(__name__)
 
 
 class AgentGraph:
     def __init__(self) -> None:
         self._workflow = StateGraph(AgentState)
 
-    async def build_graph(self, checkpointer: AIOMySQLSaver) -> CompiledStateGraph:
         self._workflow.add_node(AgentNodes.ENTRY, entry_node)
+        self._workflow.add_node(AgentNodes.COMPACT, compact_node)
         self._workflow.add_node(AgentNodes.ANSWER, answer_node)
         self._workflow.add_node(AgentNodes.SAVE_MESSAGE, save_message_node)
 
         self._workflow.add_edge(START, AgentNodes.ENTRY)
-        self._workflow.add_edge(AgentNodes.ENTRY, AgentNodes.ANSWER)
+        self._workflow.add_edge(AgentNodes.ENTRY, AgentNodes.COMPACT)
+        self._workflow.add_edge(AgentNodes.COMPACT, AgentNodes.ANSWER)
         self._workflow.add_edge(AgentNodes.ANSWER, AgentNodes.SAVE_MESSAGE)
         self._workflow.add_edge(AgentNodes.SAVE_MESSAGE, END)
 
-        # Use the global checkpointer instance
+    async def build_graph(self, checkpointer: Optional[BaseCheckpointSaver]) -> CompiledStateGraph:
         return self._workflow.compile(checkpointer=checkpointer)
+
+
+class GraphRegistry:
+    """
+    Compiled graphs shared by all requests, keyed by graph variant.
+
+    Compilation happens once per key; least recently used variants are evicted
+    when more than `max_size` are cached.
+    """
+
+    DEFAULT_KEY = "default"
+
+    def __init__(self, max_size: int) -> None:
+        self._graphs: LRUCache[Hashable, CompiledStateGraph] = LRUCache(max_size)
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: Hashable = DEFAULT_KEY) -> CompiledStateGraph:
+        graph = self._graphs.get(key)
+        if graph is not None:
+            return graph
+
+        async with self._lock:
+            # Another request may have compiled it while we waited
+            graph = self._graphs.get(key)
+            if graph is None:
+                logger.info(f"Compiling agent graph '{key}'")
+                # History rebuilt from the Message table needs no checkpoints
+                checkpointer = get_checkpointer() if settings.CHAT_HISTORY_SOURCE == "checkpoint" else None
+                graph = await AgentGraph().build_graph(checkpointer)
+                self._graphs.set(key, graph)
+        return graph
+
+    def clear(self) -> None:
+        self._graphs.clear()
+
+
+graph_registry = GraphRegistry(max_size=settings.GRAPH_CACHE_MAX_SIZE)
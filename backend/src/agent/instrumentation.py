@@ -0,0 +1,74 @@
+import functools
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, message_chunk_to_message
+
+from src.utils.metrics import Counter, Histogram
+
+F = TypeVar("F", bound=Callable[..., Awaitable[Any]])
+
+node_seconds = Histogram(
+    "agent_node_seconds",
+    "Time spent in each agent graph node",
+    labels=("node",),
+)
+llm_ttft_seconds = Histogram(
+    "llm_time_to_first_token_seconds",
+    "Time until the LLM produced its first chunk",
+    labels=("agent", "purpose"),
+)
+llm_seconds = Histogram(
+    "llm_request_seconds",
+    "Total LLM call latency",
+    labels=("agent", "purpose"),
+)
+llm_tokens = Counter(
+    "llm_tokens_total",
+    "Tokens used by LLM calls",
+    labels=("agent", "purpose", "type"),
+)
+
+
+def timed_node(name: str) -> Callable[[F], F]:
+    """
+    Record the node's duration in `agent_node_seconds`.
+
+    The wrapper keeps the node's signature, so LangGraph still injects `config`.
+    """
+    def decorator(node: F) -> F:
+        @functools.wraps(node)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with node_seconds.time(node=name):
+                return await node(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def invoke_llm(llm: BaseChatModel, messages: list[BaseMessage], agent: Any, purpose: str) -> BaseMessage:
+    """
+    Call the LLM by streaming and return the assembled message.
+
+    Streaming gives us time-to-first-token for every call and still lets
+    LangGraph's "messages" stream mode forward chunks to clients.
+    """
+    start = time.perf_counter()
+    message = None
+    async for chunk in llm.astream(messages):
+        if message is None:
+            llm_ttft_seconds.observe(time.perf_counter() - start, agent=agent, purpose=purpose)
+            message = chunk
+        else:
+            message += chunk
+    llm_seconds.observe(time.perf_counter() - start, agent=agent, purpose=purpose)
+
+    if message is None:
+        raise ValueError("LLM returned an empty response")
+
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        llm_tokens.inc(usage.get("input_tokens", 0), agent=agent, purpose=purpose, type="prompt")
+        llm_tokens.inc(usage.get("output_tokens", 0), agent=agent, purpose=purpose, type="completion")
+
+    return message_chunk_to_message(message)
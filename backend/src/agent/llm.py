@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import math
+import random
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from src.config import settings, get_logger
+
+logger = get_logger(__name__)
+
+LLMFactory = Callable[[], BaseChatModel]
+
+_providers: dict[str, LLMFactory] = {}
+
+
+def register_provider(name: str) -> Callable[[LLMFactory], LLMFactory]:
+    def decorator(factory: LLMFactory) -> LLMFactory:
+        _providers[name] = factory
+        return factory
+    return decorator
+
+
+def create_llm(provider: Optional[str] = None) -> BaseChatModel:
+    """
+    Build the chat model for `provider` (defaults to settings.LLM_PROVIDER).
+    """
+    provider = provider or settings.LLM_PROVIDER
+    factory = _providers.get(provider)
+    if factory is None:
+        raise ValueError(f"Unknown LLM provider '{provider}', expected one of: {', '.join(sorted(_providers))}")
+
+    logger.info(f"Using LLM provider '{provider}'")
+    return factory()
+
+
+@register_provider("openai")
+def _openai() -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=settings.LLM_MODEL, api_key=settings.OPENAI_API_KEY, stream_usage=True)
+
+
+@register_provider("fake")
+def _fake() -> BaseChatModel:
+    return FakeChatModel(
+        latency_ms=settings.FAKE_LLM_LATENCY_MS,
+        latency_sigma=settings.FAKE_LLM_LATENCY_SIGMA,
+        token_delay_ms=settings.FAKE_LLM_TOKEN_DELAY_MS,
+        response_tokens=settings.FAKE_LLM_RESPONSE_TOKENS,
+        failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+        seed=settings.FAKE_LLM_SEED,
+    )
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+_WORDS = (
+    "sure", "here", "is", "the", "answer", "to", "your", "question", "we", "can",
+    "help", "with", "that", "today", "thanks", "for", "asking", "about", "our", "service",
+)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model for load tests and benchmarks.
+
+    Replies are derived from the last message, so the same prompt always gets the
+    same text. Time to first token follows a log-normal distribution around
+    `latency_ms` (constant when `latency_sigma` is 0), the reply is streamed word
+    by word every `token_delay_ms`, and `failure_rate` of the calls raise
+    FakeLLMError before producing anything.
+    """
+
+    latency_ms: float = 200.0
+    latency_sigma: float = 0.0
+    token_delay_ms: float = 0.0
+    response_tokens: int = 30
+    failure_rate: float = 0.0
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr(default_factory=random.Random)
+
+    def model_post_init(self, context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _first_token_delay(self) -> float:
+        if self.latency_sigma <= 0:
+            return self.latency_ms / 1000
+        return self.latency_ms * math.exp(self._rng.gauss(0, self.latency_sigma)) / 1000
+
+    def _maybe_fail(self) -> None:
+        if self.failure_rate > 0 and self._rng.random() < self.failure_rate:
+            raise FakeLLMError("Injected fake LLM failure")
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        seed = str(messages[-1].content) if messages else ""
+        digest = hashlib.sha256(seed.encode()).digest()
+        words = [_WORDS[digest[i % len(digest)] % len(_WORDS)] for i in range(self.response_tokens)]
+        return [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+
+    def _usage(self, messages: list[BaseMessage], output_tokens: int) -> UsageMetadata:
+        input_tokens = count_tokens_approximately(messages)
+        return UsageMetadata(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._maybe_fail()
+        tokens = self._tokens(messages)
+        time.sleep(self._first_token_delay() + self.token_delay_ms * max(len(tokens) - 1, 0) / 1000)
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._maybe_fail()
+        time.sleep(self._first_token_delay())
+        for i, token in enumerate(self._tokens(messages)):
+            if i and self.token_delay_ms > 0:
+                time.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, self.response_tokens)))
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        self._maybe_fail()
+        await asyncio.sleep(self._first_token_delay())
+        for i, token in enumerate(self._tokens(messages)):
+            if i and self.token_delay_ms > 0:
+                await asyncio.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, self.response_tokens)))
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = None
+        async for chunk in self._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            message = chunk.message if message is None else message + chunk.message
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content=message.content,
+            usage_metadata=message.usage_metadata,
+        ))])
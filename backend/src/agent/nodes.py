@@ -1,47 +1,145 @@
 from enum import StrEnum
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, AnyMessage, SystemMessage, HumanMessage, RemoveMessage
 from langgraph.graph.state import RunnableConfig
 
 from src.agent.state import AgentState
-from src.config import get_logger
-from src.db.session import get_session
+from src.agent.context import split_history
+from src.agent import response_cache
+from src.agent.instrumentation import timed_node, invoke_llm
+from src.agent.llm import create_llm
+from src.config import settings, get_logger
+from src.db.crud import MessageCRUD
 from src.db.model.message import Message, MessageRole
-from src.db.crud import Database
+from src.db.session import get_session
+from src.db.writer import message_writer
 
 logger = get_logger(__name__)
 
-llm = ChatOpenAI(model="gpt-5-nano")
+llm = create_llm()
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a chat between an assistant and a client. "
+    "Update the summary with the new messages, keeping names, facts, preferences "
+    "and open questions. Reply with the updated summary only."
+)
 
 
 class AgentNodes(StrEnum):
     ENTRY = "entry"
+    COMPACT = "compact"
     ANSWER = "answer"
     SAVE_MESSAGE = "save_message"
 
 
-async def entry_node(state: AgentState) -> dict:
+def _to_langchain(message: Message) -> AnyMessage:
+    # A stable id, so the row's token count stays cached across runs
+    message_id = f"message-{message.id}"
+    if message.role == MessageRole.AGENT:
+        return AIMessage(content=message.text, id=message_id)
+    return HumanMessage(content=message.text, name=message.client_name or "client", id=message_id)
+
+
+async def _load_history(chat_id: int) -> list[AnyMessage]:
+    # The previous turn may still be queued in the write-behind
+    await message_writer.wait_for_chat(chat_id)
+    async with get_session() as session:
+        messages = await MessageCRUD.get_messages_by_chat_id(session, chat_id, limit=settings.CHAT_HISTORY_MESSAGES)
+    return [_to_langchain(message) for message in messages]
+
+
+@timed_node(AgentNodes.ENTRY)
+async def entry_node(state: AgentState, config: RunnableConfig) -> dict:
     """
     Node to get the entry message from the database.
+
+    With CHAT_HISTORY_SOURCE=messages the graph has no checkpointer, so the
+    history is rebuilt from the chat's latest Message rows first.
+    """
+    messages = []
+    if settings.CHAT_HISTORY_SOURCE == "messages" and settings.CHAT_HISTORY_MESSAGES > 0:
+        messages = await _load_history(config.get("configurable", {}).get("thread_id"))
+
+    messages.append(HumanMessage(content=state.query, name=state.client_name or "client"))
+    return { "messages": messages }
+
+
+async def _summarize(summary: str | None, messages: list[AnyMessage], agent_id: int | None) -> str:
+    transcript = "\n".join(f"{message.type}: {message.content}" for message in messages)
+    result = await invoke_llm(
+        llm,
+        [
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"),
+        ],
+        agent=agent_id,
+        purpose="summary",
+    )
+    return result.content
+
+
+@timed_node(AgentNodes.COMPACT)
+async def compact_node(state: AgentState, config: RunnableConfig) -> dict:
     """
-    return { "messages": [HumanMessage(content=state.query, name=state.client_name or "client")] }
+    Node to keep the history within the agent's token budget.
+
+    Messages beyond the budget are removed from the state and, if enabled,
+    folded into the rolling summary.
+    """
+    configurable = config.get("configurable", {})
+    budget = configurable.get("token_budget", settings.CONTEXT_TOKEN_BUDGET)
+    old_messages, _ = split_history(state.messages, budget)
+    if not old_messages:
+        return {}
+
+    update = { "messages": [RemoveMessage(id=message.id) for message in old_messages] }
+    # Without checkpoints the summary would not outlive the run
+    if settings.CONTEXT_SUMMARIZE and settings.CHAT_HISTORY_SOURCE == "checkpoint":
+        update["summary"] = await _summarize(state.summary, old_messages, configurable.get("agent_id"))
+    return update
 
 
-async def answer_node(state: AgentState) -> dict:
+@timed_node(AgentNodes.ANSWER)
+async def answer_node(state: AgentState, config: RunnableConfig) -> dict:
     """
     Node to get an answer from the LLM.
+
+    For agents with the response cache enabled, identical queries are answered
+    from the cache without calling the LLM.
     """
-    ai_message = await llm.ainvoke(
-        [SystemMessage(content=state.system_prompt), *state.messages],
+    configurable = config.get("configurable", {})
+    agent_config = configurable.get("agent_config")
+    system_prompt = (agent_config and agent_config.system_prompt) or DEFAULT_SYSTEM_PROMPT
+    cache_key = None
+    if configurable.get("response_cache"):
+        cache_key = response_cache.make_key(system_prompt, state.query, state.messages[:-1])
+        cached_response = response_cache.get_response(cache_key)
+        if cached_response is not None:
+            return { "messages": [AIMessage(content=cached_response)] }
+
+    prompt = [SystemMessage(content=system_prompt)]
+    if state.summary:
+        prompt.append(SystemMessage(content=f"Summary of the earlier conversation:\n{state.summary}"))
+
+    ai_message = await invoke_llm(
+        llm,
+        [*prompt, *state.messages],
+        agent=configurable.get("agent_id"),
+        purpose="answer",
     )
 
+    if cache_key is not None and isinstance(ai_message.content, str):
+        response_cache.set_response(cache_key, ai_message.content)
+
     return { "messages": [ai_message] }
 
 
+@timed_node(AgentNodes.SAVE_MESSAGE)
 async def save_message_node(state: AgentState, config: RunnableConfig) -> dict:
     """
-    Node to save the message to the database.
+    Node to queue the client and agent messages for the database write-behind.
     """
     chat_id = config.get("configurable", {}).get("thread_id")
 
@@ -49,24 +147,24 @@ async def save_message_node(state: AgentState, config: RunnableConfig) -> dict:
         raise ValueError("thread_id not found in config")
 
     ai_message = state.messages[-1]
-    user_message = state.query
 
-    # Create and save user message
-    async with get_session() as session:
-        user_message_db = Message(
+    # One row per message the client sent, even when they were answered together
+    messages_db = [
+        Message(
             chat_id=chat_id, 
-            text=user_message,
+            text=text,
             client_name=state.client_name,
             role=MessageRole.CLIENT
         )
-        await Database.create(session, user_message_db)
-
-        # Save agent response
-        agent_message_db = Message(
+        for text in state.queries or [state.query]
+    ]
+    messages_db.append(
+        Message(
             chat_id=chat_id, 
             text=ai_message.content, 
             role=MessageRole.AGENT
         )
-        await Database.create(session, agent_message_db)
+    )
+    await message_writer.submit(*messages_db)
 
     return {}
@@ -0,0 +1,53 @@
+import hashlib
+import re
+from typing import Optional
+
+from langchain_core.messages import AnyMessage
+
+from src.config import settings
+from src.utils.cache import LRUCache
+from src.utils.metrics import Counter
+
+_whitespace = re.compile(r"\s+")
+
+response_cache: LRUCache[str, str] = LRUCache(
+    max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL,
+)
+
+response_cache_requests = Counter(
+    "llm_response_cache_requests_total",
+    "LLM response cache lookups by result",
+    labels=("result",),
+)
+
+
+def normalize(text: str) -> str:
+    return _whitespace.sub(" ", text).strip().casefold()
+
+
+def make_key(system_prompt: str, query: str, history: list[AnyMessage]) -> str:
+    """
+    Build the cache key from the agent prompt, the normalized query and the
+    RESPONSE_CACHE_CONTEXT_TURNS messages that precede it.
+    """
+    turns = settings.RESPONSE_CACHE_CONTEXT_TURNS
+    tail = history[-turns:] if turns > 0 else []
+
+    digest = hashlib.sha256()
+    digest.update(hashlib.sha256(system_prompt.encode()).digest())
+    for message in tail:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        digest.update(f"\x1e{message.type}\x1f{normalize(content)}".encode())
+    digest.update(f"\x1d{normalize(query)}".encode())
+    return digest.hexdigest()
+
+
+def get_response(key: str) -> Optional[str]:
+    response = response_cache.get(key)
+    response_cache_requests.inc(result="hit" if response is not None else "miss")
+    return response
+
+
+def set_response(key: str, response: str) -> None:
+    response_cache.set(key, response)
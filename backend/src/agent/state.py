@@ -8,5 +8,6 @@ from typing import Annotated, Optional
 class AgentState(BaseModel):
     messages: Annotated[list[AnyMessage], add_messages]
     query: str
-    system_prompt: str
+    queries: list[str] = []  # Individual messages merged into `query`
     client_name: Optional[str] = None
+    summary: Optional[str] = None
@@ -1,97 +1,214 @@
-from langgraph.checkpoint.mysql.aio import AIOMySQLSaver
-from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Any, AsyncIterator, Optional
+
+from langgraph.graph.state import CompiledStateGraph
 
-from src.config import settings
 from src.db.model.message import MessageCreate
-from src.db.model.chat import Chat, ChatCreate
-from src.db.model.agent import Agent
-from src.db.crud import Database
-from src.agent.graph import AgentGraph
-from src.config import get_logger
+from src.db.model.chat import ChatCreate
+from src.db.crud import AgentCRUD, ChatCRUD
+from src.db.session import get_session
+from src.agent.graph import graph_registry
+from src.agent.nodes import AgentNodes
+from src.config import settings, get_logger
+from src.utils.cache import LRUCache, SingleFlight
+from src.utils.coalesce import Coalescer
+from src.utils.locks import KeyedLock
+from src.utils.metrics import Histogram
 
 logger = get_logger(__name__)
 
-async def process_message(session: AsyncSession, chat: ChatCreate, message: MessageCreate) -> str:
+ERROR_RESPONSE = "I'm sorry, I encountered an error while processing your message. Please try again."
+
+# (agent_id, platform_id, external_chat_id) -> internal chat id
+chat_id_cache: LRUCache[tuple[int, int, int], int] = LRUCache(
+    max_size=settings.CHAT_CACHE_MAX_SIZE,
+    ttl=settings.CHAT_CACHE_TTL,
+)
+_chat_resolution: SingleFlight[tuple[int, int, int], int] = SingleFlight()
+
+# Messages of one chat run one at a time so they don't overwrite each other's checkpoints
+chat_locks: KeyedLock[int] = KeyedLock(
+    wait_seconds=Histogram("chat_lock_wait_seconds", "Time a message waited for its chat to be free"),
+)
+
+# Bursts of messages from one chat are merged into a single graph run
+message_coalescer: Coalescer[int, MessageCreate, str] = Coalescer(
+    window=settings.CHAT_COALESCE_WINDOW_MS / 1000,
+    max_wait=settings.CHAT_COALESCE_MAX_WAIT_MS / 1000,
+)
+coalesced_messages = Histogram(
+    "chat_coalesced_messages",
+    "Messages answered by a single graph run",
+    buckets=(1, 2, 3, 5, 8, 13, 21),
+)
+
+
+async def _upsert_chat(chat: ChatCreate) -> int:
+    async with get_session() as session:
+        return await ChatCRUD.get_or_create_id(session, chat)
+
+
+async def resolve_chat_id(chat: ChatCreate) -> int:
+    """
+    Map an external chat to its internal chat id, creating the chat on first contact.
+
+    Concurrent first messages from the same chat share a single upsert.
+    """
+    key = (chat.agent_id, chat.platform_id, chat.id)
+    chat_id = chat_id_cache.get(key)
+    if chat_id is not None:
+        return chat_id
+
+    chat_id = await _chat_resolution.do(key, lambda: _upsert_chat(chat))
+    chat_id_cache.set(key, chat_id)
+    return chat_id
+
+
+async def _build_run(chat: ChatCreate, messages: list[MessageCreate], chat_id: int) -> tuple[dict, dict]:
+    """
+    Build the graph input state and run config for one or more consecutive messages.
+    """
+    # Get agent configuration; a cache hit never checks out a connection
+    async with get_session() as session:
+        agent_config = await AgentCRUD.get_config(session, chat.agent_id)
+    if not agent_config:
+        raise ValueError(f"Agent with id {chat.agent_id} not found")
+
+    token_budget = agent_config.context_token_budget
+    if token_budget is None:
+        token_budget = settings.CONTEXT_TOKEN_BUDGET
+
+    config = {
+        "configurable": {
+            "thread_id": chat_id,
+            "agent_id": chat.agent_id,
+            "token_budget": token_budget,
+            "response_cache": agent_config.response_cache_enabled,
+            # Static per-agent data (system prompt) is read from the cached config
+            # instead of the state, so it stays out of every checkpoint. Only
+            # primitive configurable values are copied into checkpoint metadata.
+            "agent_config": agent_config,
+        }
+    }
+
+    # Prepare the input state for the agent
+    agent_input = {
+        "messages": [],
+        "query": "\n".join(message.text for message in messages),
+        "queries": [message.text for message in messages],
+        "client_name": messages[-1].client_name,
+    }
+    return agent_input, config
+
+
+def _message_text(message: Any) -> str:
+    return message.content if hasattr(message, "content") else str(message)
+
+
+async def process_message(chat: ChatCreate, message: MessageCreate, raise_errors: bool = False) -> Optional[str]:
     """
     Process a user message and return an agent response.
+
+    If the graph run fails, ERROR_RESPONSE is returned, or with `raise_errors`
+    the exception is raised for the caller to report.
+
+    Database sessions are opened only around the queries themselves, so no
+    connection is held while the LLM answers.
+
+    With CHAT_COALESCE_WINDOW_MS set, messages from the same chat arriving within
+    the window are answered together in a single LLM turn. The answer is returned
+    for the last message of the burst only; the others return None and need no
+    reply of their own.
     """
     try:
-        # Look up chat by external_chat_id (Telegram/WhatsApp chat ID)
-        from sqlmodel import select
-        external_chat_id = chat.id  # This is the Telegram/WhatsApp chat ID
-        statement = select(Chat).where(Chat.external_chat_id == external_chat_id)
-        result = await session.exec(statement)
-        existing_chat = result.first()
-        
-        if not existing_chat:
-            try:
-                # Validate that referenced entities exist before creating chat
-                from src.db.model.user import User
-                from src.db.model.platform import Platform
-                
-                # Check if user exists
-                user_exists = await Database.get(session, chat.user_id, User)
-                if not user_exists:
-                    raise ValueError(f"User with id {chat.user_id} does not exist")
-                
-                # Check if agent exists
-                agent_exists = await Database.get(session, chat.agent_id, Agent)
-                if not agent_exists:
-                    raise ValueError(f"Agent with id {chat.agent_id} does not exist")
-                
-                # Check if platform exists
-                platform_exists = await Database.get(session, chat.platform_id, Platform)
-                if not platform_exists:
-                    raise ValueError(f"Platform with id {chat.platform_id} does not exist")
-                
-                # Create chat with external_chat_id, let database auto-generate id
-                chat_data = chat.model_dump()
-                chat_data['external_chat_id'] = chat_data.pop('id')  # Move id to external_chat_id
-                chat_db = Chat(**chat_data)
-                await Database.create(session, chat_db)
-                await session.refresh(chat_db)
-                chat_id = chat_db.id
-            except Exception as e:
-                logger.error(f"Error creating chat: {str(e)}")
-                logger.error(f"Chat data: {chat.model_dump()}")
-                raise e
-        else:
-            chat_id = existing_chat.id
+        chat_id = await resolve_chat_id(chat)
     except Exception as e:
         logger.exception("Error creating chat")
         raise e
 
     try:
-        # Get agent configuration
-        agent_db = await Database.get(session, chat.agent_id, Agent)
-        if not agent_db:
-            raise ValueError(f"Agent with id {chat.agent_id} not found")
-
-        config = {"configurable": {"thread_id": chat_id}}
-
-        # Prepare the input state for the agent
-        agent_input = {
-            "messages": [],
-            "query": message.text,
-            "system_prompt": agent_db.system_prompt if hasattr(agent_db, 'system_prompt') else "You are a helpful assistant.",
-            "client_name": message.client_name,
-        }
+        if settings.CHAT_COALESCE_WINDOW_MS <= 0:
+            return await _run_messages(chat, chat_id, [message])
 
-        # Create graph and config
-        agent_graph = AgentGraph()
+        return await message_coalescer.submit(
+            chat_id,
+            message,
+            lambda messages: _run_messages(chat, chat_id, messages),
+        )
+    except Exception:
+        if raise_errors:
+            raise
+        return ERROR_RESPONSE
 
-        async with AIOMySQLSaver.from_conn_string(settings.DATABASE_URL) as checkpointer:
-            app = await agent_graph.build_graph(checkpointer)
 
-            # Process through the graph
-            response = await app.ainvoke(agent_input, config=config)
+async def _run_messages(chat: ChatCreate, chat_id: int, messages: list[MessageCreate]) -> str:
+    coalesced_messages.observe(len(messages))
+    try:
+        agent_input, config = await _build_run(chat, messages, chat_id)
+
+        # Reuse the graph compiled at startup
+        app = await graph_registry.get()
+
+        # Process through the graph
+        async with chat_locks.acquire(chat_id):
+            response = await app.ainvoke(agent_input, config=config, durability=settings.CHECKPOINT_DURABILITY)
         
         # Extract the last AI message
-        last_message = response["messages"][-1]
-        response_text = last_message.content if hasattr(last_message, "content") else str(last_message)
-
-        return response_text
+        return _message_text(response["messages"][-1])
     
     except Exception:
         logger.exception("Error processing message")
-        return "I'm sorry, I encountered an error while processing your message. Please try again."
\ No newline at end of file
+        raise
+
+
+async def stream_message(chat: ChatCreate, message: MessageCreate) -> AsyncIterator[dict]:
+    """
+    Process a user message and stream the agent response as it is generated.
+
+    Chat and agent lookups happen before this returns, each in its own short
+    session, so no connection is held while the returned iterator is consumed.
+    The iterator yields `{"token": ...}` for each LLM chunk and finishes with
+    `{"response": ...}` once the message has been handed to the message writer,
+    or with `{"error": ...}` if the message could not be processed.
+    """
+    try:
+        chat_id = await resolve_chat_id(chat)
+    except Exception as e:
+        logger.exception("Error creating chat")
+        raise e
+
+    try:
+        agent_input, config = await _build_run(chat, [message], chat_id)
+        app = await graph_registry.get()
+    except Exception:
+        # Same reply /chat/ gives, e.g. for a missing or disabled agent
+        logger.exception("Error preparing message stream")
+        return _error_events()
+    return _stream_events(app, agent_input, config, chat_id)
+
+
+async def _error_events() -> AsyncIterator[dict]:
+    yield {"error": ERROR_RESPONSE}
+
+
+async def _stream_events(app: CompiledStateGraph, agent_input: dict, config: dict, chat_id: int) -> AsyncIterator[dict]:
+    response_text = ""
+    try:
+        async with chat_locks.acquire(chat_id):
+            async for mode, payload in app.astream(
+                agent_input,
+                config=config,
+                stream_mode=["messages", "updates"],
+                durability=settings.CHECKPOINT_DURABILITY,
+            ):
+                if mode == "messages":
+                    chunk, metadata = payload
+                    if metadata.get("langgraph_node") == AgentNodes.ANSWER and isinstance(chunk.content, str) and chunk.content:
+                        yield {"token": chunk.content}
+                elif payload and AgentNodes.ANSWER in payload:
+                    response_text = _message_text(payload[AgentNodes.ANSWER]["messages"][-1])
+    except Exception:
+        logger.exception("Error streaming message")
+        yield {"error": ERROR_RESPONSE}
+        return
+
+    yield {"response": response_text}
@@ -0,0 +1,142 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import aiohttp
+from fastapi import HTTPException, status
+
+from src.config import settings, get_logger
+from src.controllers.chat import process_message, ERROR_RESPONSE
+from src.db.model.chat import ChatCreate
+from src.db.model.message import MessageCreate
+from src.schemas.chat import ChatJob, ChatJobStatus
+from src.utils.cache import LRUCache
+from src.utils.metrics import Gauge
+
+logger = get_logger(__name__)
+
+
+class ChatJobRunner:
+    """
+    Bounded worker pool for chat messages answered in the background.
+
+    Jobs are queued by `submit` and processed by a fixed number of workers; the
+    result is kept for polling and, when CHAT_JOB_CALLBACK_URL is set, POSTed
+    to it.
+    """
+
+    def __init__(self, workers: int, max_pending: int, max_stored: int, ttl: float) -> None:
+        self.workers = workers
+        self._queue: asyncio.Queue[tuple[ChatJob, ChatCreate, MessageCreate]] = asyncio.Queue(maxsize=max_pending)
+        self._jobs: LRUCache[str, ChatJob] = LRUCache(max_size=max_stored, ttl=ttl)
+        self._tasks: list[asyncio.Task] = []
+        self._http: Optional[aiohttp.ClientSession] = None
+
+        self.queue_depth = Gauge("chat_job_queue_depth", "Chat jobs waiting for a worker", fn=self._queue.qsize)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        if settings.CHAT_JOB_CALLBACK_URL and not settings.CHAT_JOB_CALLBACK_SECRET:
+            logger.warning("CHAT_JOB_CALLBACK_SECRET is not set, chatBot will reject job callbacks")
+        self._http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=settings.CHAT_JOB_CALLBACK_TIMEOUT))
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"chat-job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        """
+        Give queued jobs a chance to finish, then stop the workers.
+        """
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=settings.CHAT_JOB_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stopping with {self._queue.qsize()} chat job(s) still queued")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        await self._http.close()
+        self._http = None
+
+    def submit(self, chat: ChatCreate, message: MessageCreate) -> ChatJob:
+        job = ChatJob(id=uuid.uuid4().hex, created_at=datetime.now(timezone.utc))
+        try:
+            self._queue.put_nowait((job, chat, message))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many pending chat jobs, try again later",
+            )
+        self._jobs.set(job.id, job)
+        return job
+
+    def get(self, job_id: str) -> ChatJob | None:
+        return self._jobs.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job, chat, message = await self._queue.get()
+            try:
+                await self._run(job, chat, message)
+                if settings.CHAT_JOB_CALLBACK_URL:
+                    await self._deliver(job, chat, settings.CHAT_JOB_CALLBACK_URL)
+            except Exception:
+                logger.exception(f"Error running chat job {job.id}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: ChatJob, chat: ChatCreate, message: MessageCreate) -> None:
+        job.status = ChatJobStatus.RUNNING
+        try:
+            job.response = await process_message(chat, message, raise_errors=True)
+            job.coalesced = job.response is None
+            job.status = ChatJobStatus.DONE
+        except Exception as e:
+            # The traceback was logged where it was raised
+            logger.error(f"Chat job {job.id} failed: {e!r}")
+            job.response = ERROR_RESPONSE
+            job.error = type(e).__name__
+            job.status = ChatJobStatus.FAILED
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+
+    async def _deliver(self, job: ChatJob, chat: ChatCreate, callback_url: str) -> None:
+        payload = {
+            "job_id": job.id,
+            "status": job.status.value,
+            "response": job.response,
+            "coalesced": job.coalesced,
+            "error": job.error,
+            "chat": {"id": chat.id, "agent_id": chat.agent_id},
+        }
+        headers = {"X-Callback-Secret": settings.CHAT_JOB_CALLBACK_SECRET} if settings.CHAT_JOB_CALLBACK_SECRET else {}
+
+        for attempt in range(1, settings.CHAT_JOB_CALLBACK_RETRIES + 1):
+            try:
+                async with self._http.post(callback_url, json=payload, headers=headers) as response:
+                    if response.status < 400:
+                        return
+                    text = await response.text()
+                    logger.error(f"Callback for job {job.id} failed with status {response.status}: {text}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.error(f"Callback request error for job {job.id}: {e}")
+
+            if attempt < settings.CHAT_JOB_CALLBACK_RETRIES:
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+        logger.error(f"Giving up delivering job {job.id} to {callback_url}")
+
+
+chat_job_runner = ChatJobRunner(
+    workers=settings.CHAT_JOB_WORKERS,
+    max_pending=settings.CHAT_JOB_MAX_PENDING,
+    max_stored=settings.CHAT_JOB_MAX_STORED,
+    ttl=settings.CHAT_JOB_TTL,
+)
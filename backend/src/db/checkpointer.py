@@ -0,0 +1,491 @@
+import asyncio
+from contextlib import asynccontextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Sequence
+
+import aiomysql
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.mysql import _ainternal
+from langgraph.checkpoint.mysql.aio import AIOMySQLSaver
+
+from src.config import settings, get_logger
+from src.db.serde import CompressedSerializer
+from src.utils.cache import LRUCache
+from src.utils.metrics import Counter, Gauge, Histogram
+
+logger = get_logger(__name__)
+
+checkpoint_seconds = Histogram(
+    "checkpoint_operation_seconds",
+    "Checkpointer latency by operation",
+    labels=("operation",),
+)
+checkpoint_cache_requests = Counter(
+    "checkpoint_cache_requests_total",
+    "Checkpoint reads by cache result",
+    labels=("result",),
+)
+checkpoint_write_failures = Counter(
+    "checkpoint_write_failures_total",
+    "Checkpoint writes that could not be persisted",
+)
+
+
+# Cursor of the transaction opened by PooledAIOMySQLSaver.transaction() in this task
+_transaction_cursor: ContextVar[Optional[aiomysql.DictCursor]] = ContextVar("checkpoint_transaction_cursor", default=None)
+
+
+class PooledAIOMySQLSaver(AIOMySQLSaver):
+    """
+    AIOMySQLSaver backed by an aiomysql connection pool.
+
+    The upstream saver guards every cursor with an instance lock because it assumes
+    a single shared connection. Pooled cursors each run on their own connection, so
+    the lock is skipped and concurrency is bounded by the pool size instead.
+    """
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[None]:
+        """
+        Run every write made inside the block on one connection, in one transaction.
+        """
+        async with self._cursor(pipeline=True) as cur:
+            token = _transaction_cursor.set(cur)
+            try:
+                yield
+            finally:
+                _transaction_cursor.reset(token)
+
+    @asynccontextmanager
+    async def _cursor(self, *, pipeline: bool = False) -> AsyncIterator[aiomysql.DictCursor]:
+        if pipeline and (cur := _transaction_cursor.get()) is not None:
+            yield cur
+            return
+        async with _ainternal.get_connection(self.conn) as conn:
+            if pipeline:
+                await conn.begin()
+                try:
+                    async with self._get_cursor_from_connection(conn) as cur:
+                        yield cur
+                    await conn.commit()
+                except BaseException:
+                    await conn.rollback()
+                    raise
+            else:
+                async with self._get_cursor_from_connection(conn) as cur:
+                    yield cur
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with checkpoint_seconds.time(operation="get_tuple"):
+            return await super().aget_tuple(config)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with checkpoint_seconds.time(operation="put"):
+            return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with checkpoint_seconds.time(operation="put_writes"):
+            await super().aput_writes(config, writes, task_id, task_path)
+
+
+@dataclass
+class _CachedThread:
+    checkpoint: CheckpointTuple
+    # (task_id, idx) -> (task_id, channel, value), mirroring the writes table key
+    writes: dict[tuple[str, int], tuple[str, str, Any]] = field(default_factory=dict)
+
+
+@dataclass
+class _PendingWrite:
+    key: tuple[str, str]
+    operation: Callable[[], Awaitable[Any]]
+    done: asyncio.Future
+
+
+class TieredCheckpointer(BaseCheckpointSaver):
+    """
+    Checkpointer that keeps the latest checkpoint of recently active threads in
+    memory in front of a MySQL saver.
+
+    `aget_tuple` for a thread's latest checkpoint is answered from a bounded LRU
+    and only falls back to MySQL on a miss. Writes are persisted by one
+    background task per thread, which writes everything queued for its thread in
+    order and in a single transaction; threads don't wait for each other. In
+    strict mode (the default) `aput` and `aput_writes` wait for MySQL and only
+    then update the cache. Otherwise they update the cache and return once
+    queued, so a crash can lose the checkpoints still in the queue. A failed
+    write drops the thread from the cache either way.
+
+    The cache is per process, like the chat locks, so every message of a chat is
+    expected to reach the same worker; `ttl` bounds staleness when it does not.
+    """
+
+    def __init__(
+        self,
+        saver: BaseCheckpointSaver,
+        max_size: int,
+        ttl: Optional[float],
+        strict: bool,
+        queue_size: int,
+        batch_size: int,
+    ) -> None:
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+        self.strict = strict
+        self.batch_size = batch_size
+        self._threads: LRUCache[tuple[str, str], _CachedThread] = LRUCache(max_size, ttl=ttl)
+        # Bounds the writes queued or in flight; `_persist` waits for a free slot
+        self._slots = asyncio.Semaphore(queue_size)
+        self._queued: dict[tuple[str, str], list[_PendingWrite]] = {}
+        self._flushers: dict[tuple[str, str], asyncio.Task] = {}
+        # Last queued write per thread, awaited before reading that thread from MySQL
+        self._last_write: dict[tuple[str, str], asyncio.Future] = {}
+        self._pending = 0
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def start(self) -> None:
+        self._running = True
+
+    async def stop(self) -> None:
+        """
+        Persist everything still queued, then write straight through.
+        """
+        if not self.running:
+            return
+        await self._drain()
+        self._running = False
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        return self.saver.get_next_version(current, channel)
+
+    @staticmethod
+    def _thread_key(config: RunnableConfig) -> tuple[str, str]:
+        configurable = config["configurable"]
+        return str(configurable["thread_id"]), configurable.get("checkpoint_ns", "")
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._thread_key(config)
+        checkpoint_id = get_checkpoint_id(config)
+
+        cached = self._threads.get(key)
+        if cached is not None and checkpoint_id in (None, cached.checkpoint.checkpoint["id"]):
+            checkpoint_cache_requests.inc(result="hit")
+            return cached.checkpoint._replace(
+                checkpoint=copy_checkpoint(cached.checkpoint.checkpoint),
+                pending_writes=list(cached.writes.values()),
+            )
+
+        checkpoint_cache_requests.inc(result="miss")
+        await self._wait_persisted(key)
+        checkpoint = await self.saver.aget_tuple(config)
+        if checkpoint is not None and checkpoint_id is None:
+            self._threads.set(key, _CachedThread(
+                checkpoint=checkpoint._replace(checkpoint=copy_checkpoint(checkpoint.checkpoint), pending_writes=None),
+                writes={
+                    (task_id, WRITES_IDX_MAP.get(channel, idx)): (task_id, channel, value)
+                    for idx, (task_id, channel, value) in enumerate(checkpoint.pending_writes or [])
+                },
+            ))
+        return checkpoint
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        # History lives in MySQL only, so let queued writes land first
+        if config is not None:
+            await self._wait_persisted(self._thread_key(config))
+        else:
+            await self._drain()
+        async for checkpoint in self.saver.alist(config, filter=filter, before=before, limit=limit):
+            yield checkpoint
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        key = self._thread_key(config)
+        thread_id, checkpoint_ns = key
+        parent_id = config["configurable"].get("checkpoint_id")
+        next_config: RunnableConfig = {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+        cached = _CachedThread(checkpoint=CheckpointTuple(
+            config=next_config,
+            checkpoint=copy_checkpoint(checkpoint),
+            metadata=get_checkpoint_metadata(config, metadata),
+            parent_config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }
+            } if parent_id else None,
+        ))
+
+        await self._write(
+            key,
+            lambda: self._threads.set(key, cached),
+            lambda: self.saver.aput(config, checkpoint, metadata, new_versions),
+        )
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        key = self._thread_key(config)
+
+        def update_cache() -> None:
+            cached = self._threads.get(key)
+            if cached is not None and cached.checkpoint.checkpoint["id"] == config["configurable"].get("checkpoint_id"):
+                # Same semantics as the writes table: special channels are upserted, others inserted once
+                for idx, (channel, value) in enumerate(writes):
+                    write_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                    if write_key[1] < 0 or write_key not in cached.writes:
+                        cached.writes[write_key] = (task_id, channel, value)
+
+        await self._write(key, update_cache, lambda: self.saver.aput_writes(config, writes, task_id, task_path))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        for key in [key for key in self._last_write if key[0] == str(thread_id)]:
+            await self._wait_persisted(key)
+        for key in self._threads.keys():
+            if key[0] == str(thread_id):
+                self._threads.pop(key)
+        await self.saver.adelete_thread(thread_id)
+
+    async def _write(
+        self,
+        key: tuple[str, str],
+        update_cache: Callable[[], None],
+        operation: Callable[[], Awaitable[Any]],
+    ) -> None:
+        # The cache only ever holds what MySQL has, or will have unless the write fails
+        if self.strict or not self.running:
+            await self._persist(key, operation)
+            update_cache()
+        else:
+            update_cache()
+            await self._persist(key, operation)
+
+    async def _persist(self, key: tuple[str, str], operation: Callable[[], Awaitable[Any]]) -> None:
+        # Without the background tasks (scripts, shutdown) write straight through
+        if not self.running:
+            await operation()
+            return
+
+        await self._slots.acquire()
+        write = _PendingWrite(key=key, operation=operation, done=asyncio.get_running_loop().create_future())
+        self._last_write[key] = write.done
+        self._queued.setdefault(key, []).append(write)
+        self._pending += 1
+        if key not in self._flushers:
+            self._flushers[key] = asyncio.create_task(self._flush_thread(key), name=f"checkpoint-writer-{key[0]}")
+        if self.strict:
+            await asyncio.shield(write.done)
+
+    async def _wait_persisted(self, key: tuple[str, str]) -> None:
+        done = self._last_write.get(key)
+        if done is not None:
+            await asyncio.wait([done])
+
+    async def _drain(self) -> None:
+        while self._flushers:
+            await asyncio.wait(list(self._flushers.values()))
+
+    def _take(self, key: tuple[str, str]) -> list[_PendingWrite]:
+        queued = self._queued.get(key)
+        if not queued:
+            self._queued.pop(key, None)
+            return []
+        writes, self._queued[key] = queued[:self.batch_size], queued[self.batch_size:]
+        return writes
+
+    def _transaction(self):
+        if isinstance(self.saver, PooledAIOMySQLSaver):
+            return self.saver.transaction()
+        return nullcontext()
+
+    async def _flush_thread(self, key: tuple[str, str]) -> None:
+        try:
+            while writes := self._take(key):
+                try:
+                    # One connection and one commit for everything queued for the thread
+                    async with self._transaction():
+                        for write in writes:
+                            await write.operation()
+                except Exception as e:
+                    if len(writes) == 1:
+                        self._finish(writes[0], e)
+                        continue
+                    # The transaction was rolled back; retry one by one so a bad write doesn't take the rest with it
+                    logger.warning(f"Batched checkpoint write for thread {key[0]} failed, retrying one by one: {e!r}")
+                    for write in writes:
+                        try:
+                            await write.operation()
+                        except Exception as error:
+                            self._finish(write, error)
+                        else:
+                            self._finish(write)
+                else:
+                    for write in writes:
+                        self._finish(write)
+        finally:
+            del self._flushers[key]
+
+    def _finish(self, write: _PendingWrite, error: Optional[Exception] = None) -> None:
+        if error is None:
+            write.done.set_result(None)
+        else:
+            logger.error(f"Error persisting checkpoint write for thread {write.key[0]}", exc_info=error)
+            checkpoint_write_failures.inc()
+            # The cached state includes the lost write and maybe later ones built on it,
+            # so the next read goes to MySQL instead
+            self._threads.pop(write.key)
+            write.done.set_exception(error)
+            # Nobody awaits async-mode writes, keep the loop from warning about it
+            write.done.exception()
+        if self._last_write.get(write.key) is write.done:
+            del self._last_write[write.key]
+        self._pending -= 1
+        self._slots.release()
+
+
+_pool: aiomysql.Pool | None = None
+_checkpointer: BaseCheckpointSaver | None = None
+
+checkpoint_write_queue_depth = Gauge(
+    "checkpoint_write_queue_depth",
+    "Checkpoint writes waiting to be persisted",
+    fn=lambda: _checkpointer.pending if isinstance(_checkpointer, TieredCheckpointer) else 0,
+)
+
+
+async def init_checkpointer() -> BaseCheckpointSaver:
+    """
+    Create the process-wide checkpointer and its connection pool.
+    """
+    global _pool, _checkpointer
+
+    if _checkpointer is not None:
+        return _checkpointer
+
+    _pool = await aiomysql.create_pool(
+        **AIOMySQLSaver.parse_conn_string(settings.DATABASE_URL),
+        minsize=settings.CHECKPOINTER_POOL_MIN_SIZE,
+        maxsize=settings.CHECKPOINTER_POOL_MAX_SIZE,
+        pool_recycle=settings.CHECKPOINTER_POOL_RECYCLE,
+        autocommit=True,
+    )
+    saver = PooledAIOMySQLSaver(
+        conn=_pool,
+        serde=CompressedSerializer(
+            codec=settings.CHECKPOINT_COMPRESSION,
+            level=settings.CHECKPOINT_COMPRESSION_LEVEL,
+            min_size=settings.CHECKPOINT_COMPRESSION_MIN_SIZE,
+        ),
+    )
+    await saver.setup()
+    _checkpointer = saver
+
+    logger.info(
+        f"Checkpointer pool ready (minsize={settings.CHECKPOINTER_POOL_MIN_SIZE}, "
+        f"maxsize={settings.CHECKPOINTER_POOL_MAX_SIZE})"
+    )
+
+    if settings.CHECKPOINT_CACHE_MAX_SIZE > 0:
+        _checkpointer = TieredCheckpointer(
+            saver,
+            max_size=settings.CHECKPOINT_CACHE_MAX_SIZE,
+            ttl=settings.CHECKPOINT_CACHE_TTL,
+            strict=settings.CHECKPOINT_WRITE_STRICT,
+            queue_size=settings.CHECKPOINT_WRITE_QUEUE_MAX_SIZE,
+            batch_size=settings.CHECKPOINT_WRITE_BATCH_SIZE,
+        )
+        await _checkpointer.start()
+        logger.info(
+            f"Checkpoint cache enabled (max_size={settings.CHECKPOINT_CACHE_MAX_SIZE}, "
+            f"strict={settings.CHECKPOINT_WRITE_STRICT})"
+        )
+
+    return _checkpointer
+
+
+def get_checkpointer() -> BaseCheckpointSaver:
+    """
+    Return the shared checkpointer created at startup.
+    """
+    if _checkpointer is None:
+        raise RuntimeError("Checkpointer not initialized, call init_checkpointer() first")
+    return _checkpointer
+
+
+def get_checkpoint_pool() -> aiomysql.Pool:
+    """
+    Return the connection pool behind the checkpoint tables.
+    """
+    if _pool is None:
+        raise RuntimeError("Checkpointer not initialized, call init_checkpointer() first")
+    return _pool
+
+
+async def close_checkpointer() -> None:
+    global _pool, _checkpointer
+
+    if isinstance(_checkpointer, TieredCheckpointer):
+        await _checkpointer.stop()
+
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+
+    _pool = None
+    _checkpointer = None
@@ -1,23 +1,39 @@
+from datetime import datetime
 from fastapi import HTTPException
-from sqlmodel import SQLModel, select
+from sqlmodel import SQLModel, select, or_, and_
+from sqlalchemy import func, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.exc import IntegrityError
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import Type, Union
+from typing import Optional, Type, Union
 
-from src.config import get_logger
+from src.config import settings, get_logger
+from src.db.model import utc_now
 from src.db.model.user import User, UserUpdate
-from src.db.model.agent import Agent, AgentRead, AgentCreate, AgentUpdate, Token
-from src.db.model.message import Message
+from src.db.model.agent import Agent, AgentConfig, AgentRead, AgentCreate, AgentUpdate, Token
+from src.db.model.chat import Chat, ChatCreate, ChatRead
+from src.db.model.message import Message, MessageRead
+from src.schemas.chat import ChatPage, MessagePage
+from src.utils.cache import LRUCache
+from src.utils.pagination import encode_cursor, decode_cursor
 
 logger = get_logger(__name__)
 
+# Per-process agent configs; the TTL bounds staleness across workers
+agent_config_cache: LRUCache[int, AgentConfig] = LRUCache(
+    max_size=settings.AGENT_CACHE_MAX_SIZE,
+    ttl=settings.AGENT_CACHE_TTL,
+)
+
 class Database:
     @staticmethod
     async def create(session: AsyncSession, item: SQLModel) -> SQLModel:
         try:
             session.add(item)
+            # The flush fills in the generated id and every other column has a
+            # Python-side default matching what MySQL stores (see utc_now), so
+            # the item needs no refresh SELECT
             await session.commit()
-            await session.refresh(item)
 
         except IntegrityError as e:
             logger.error(f"Integrity error: {e}", exc_info=True)
@@ -78,11 +94,13 @@ class Database:
 
     @staticmethod
     async def update(session: AsyncSession, id: Union[int, str], update_data: SQLModel, model: Type[SQLModel]) -> SQLModel:
-        # Get the existing item first (this validates it exists)
-        db_item = await Database.get(session, id, model)
-        if not db_item:
-            raise HTTPException(status_code=404, detail="Item not found")
-        
+        """
+        Update an enabled item with a single UPDATE ... WHERE id and return it.
+
+        The matched row count tells whether the item exists, so there is no
+        SELECT beforehand. The returned item comes from the session when it was
+        already loaded (and is updated in place), otherwise from one SELECT.
+        """
         # Process update data
         if not isinstance(model, User):
             update_dict = update_data.model_dump(exclude_unset=True)
@@ -94,33 +112,47 @@ class Database:
                 update_dict['password'] = get_password_hash(update_dict['password'])
         
         # Update only the fields that are not None
-        for field, value in update_dict.items():
-            if value is not None:
-                setattr(db_item, field, value)
+        values = {field: value for field, value in update_dict.items() if value is not None}
+        if not values:
+            db_item = await Database.get(session, id, model)
+            if not db_item:
+                raise HTTPException(status_code=404, detail="Item not found")
+            return db_item
+
+        statement = update(model).where(model.id == id).values(**values)
+        if hasattr(model, "disabled"):
+            statement = statement.where(model.disabled == False)
         
         try:
-            session.add(db_item)
+            result = await session.exec(statement)
             await session.commit()
-            await session.refresh(db_item)
         except Exception as e:
             logger.error(f"Error updating item: {e}")
             await session.rollback()
             raise HTTPException(status_code=400, detail=str(e))
-        return db_item
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return await session.get(model, id)
     
 
     @staticmethod
     async def delete(session: AsyncSession, id: Union[int, str], model: Type[SQLModel], update_model: Type[SQLModel]) -> None:
         if hasattr(model, "disabled") is False:
             raise HTTPException(status_code=400, detail="Model does not support soft delete")
-        return await Database.update(session, id, update_model(disabled=True), model)
+        item = await Database.update(session, id, update_model(disabled=True), model)
+        if model is Agent:
+            AgentCRUD.invalidate_config(id)
+        return item
     
     
     @staticmethod
     async def reactivate(session: AsyncSession, id: Union[int, str], model: Type[SQLModel], update_model: Type[SQLModel]) -> None:
         if hasattr(model, "disabled") is False:
             raise HTTPException(status_code=400, detail="Model does not support reactivation")
-        return await Database.update(session, id, update_model(disabled=False), model)
+        item = await Database.update(session, id, update_model(disabled=False), model)
+        if model is Agent:
+            AgentCRUD.invalidate_config(id)
+        return item
     
 
 class UserCRUD(Database):
@@ -154,7 +186,8 @@ class MessageCRUD(Database):
             statement = (
                 select(Message)
                 .where(Message.chat_id == chat_id)
-                .order_by(Message.created_at.desc())
+                # Rows of one turn usually share a second, the id keeps them in insert order
+                .order_by(Message.created_at.desc(), Message.id.desc())
                 .limit(limit)
             )
             result = await session.exec(statement)
@@ -164,6 +197,120 @@ class MessageCRUD(Database):
         except Exception as e:
             logger.error(f"Error getting messages for chat {chat_id}: {e}")
             return []
+
+
+    @staticmethod
+    async def get_page(
+        session: AsyncSession,
+        chat_id: int,
+        limit: int,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+    ) -> MessagePage:
+        """
+        Get one page of a chat's messages by keyset on (created_at, id).
+
+        Without a cursor the latest messages are returned; `before` pages towards
+        older messages and `after` towards newer ones. Each page is a range scan
+        of the (chat_id, created_at, id) index, however deep it is.
+        """
+        if before and after:
+            raise HTTPException(status_code=400, detail="Pass either before or after, not both")
+
+        statement = select(Message).where(Message.chat_id == chat_id)
+        if after:
+            created_at, id = decode_cursor(after, datetime, int)
+            statement = statement.where(or_(
+                Message.created_at > created_at,
+                and_(Message.created_at == created_at, Message.id > id),
+            )).order_by(Message.created_at, Message.id)
+        else:
+            if before:
+                created_at, id = decode_cursor(before, datetime, int)
+                statement = statement.where(or_(
+                    Message.created_at < created_at,
+                    and_(Message.created_at == created_at, Message.id < id),
+                ))
+            statement = statement.order_by(Message.created_at.desc(), Message.id.desc())
+
+        # One extra row tells whether another page follows
+        rows = list((await session.exec(statement.limit(limit + 1))).all())
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if not after:
+            rows.reverse()
+
+        page = MessagePage(items=[MessageRead.model_validate(row) for row in rows])
+        if rows:
+            oldest, newest = rows[0], rows[-1]
+            if after or has_more:
+                page.before = encode_cursor(oldest.created_at, oldest.id)
+            page.after = encode_cursor(newest.created_at, newest.id)
+            page.has_newer = has_more if after else bool(before)
+        else:
+            # Nothing newer yet: keep polling from the same place
+            page.after = after
+        return page
+
+
+class ChatCRUD(Database):
+    @staticmethod
+    async def get_or_create_id(session: AsyncSession, chat: ChatCreate) -> int:
+        """
+        Get the internal id of an external chat, creating the chat if needed, in one statement.
+
+        The insert is an upsert on the (agent_id, platform_id, external_chat_id)
+        unique key: on a duplicate, LAST_INSERT_ID(id) makes the driver report the
+        existing row's id, so concurrent first messages all get the same chat.
+        Missing users, agents or platforms are rejected by the foreign keys.
+        """
+        statement = mysql_insert(Chat).values(
+            external_chat_id=chat.id,
+            user_id=chat.user_id,
+            agent_id=chat.agent_id,
+            platform_id=chat.platform_id,
+            created_at=utc_now(),
+        )
+        statement = statement.on_duplicate_key_update(id=func.last_insert_id(Chat.id))
+        try:
+            result = await session.exec(statement)
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            raise ValueError(f"Chat references a user, agent or platform that does not exist: {e.orig}") from e
+        return result.lastrowid
+
+
+    @staticmethod
+    async def get_for_user(session: AsyncSession, chat_id: int, user_id: int) -> Chat | None:
+        chat = await session.get(Chat, chat_id)
+        if not chat or chat.user_id != user_id:
+            return None
+        return chat
+
+
+    @staticmethod
+    async def get_page_by_agent(
+        session: AsyncSession,
+        user_id: int,
+        agent_id: int,
+        limit: int,
+        before: Optional[str] = None,
+    ) -> ChatPage:
+        """
+        Get one page of an agent's chats, newest first, by keyset on id.
+        """
+        statement = select(Chat).where(Chat.agent_id == agent_id, Chat.user_id == user_id)
+        if before:
+            id, = decode_cursor(before, int)
+            statement = statement.where(Chat.id < id)
+        statement = statement.order_by(Chat.id.desc()).limit(limit + 1)
+
+        rows = list((await session.exec(statement)).all())
+        page = ChatPage(items=[ChatRead.model_validate(row) for row in rows[:limit]])
+        if len(rows) > limit:
+            page.before = encode_cursor(rows[limit - 1].id)
+        return page
         
 
 class AgentCRUD(Database):
@@ -179,15 +326,21 @@ class AgentCRUD(Database):
             logger.warning(f"Item with id {id} is disabled")
             return None
 
-        # Convert agent data to dict and handle tokens conversion
+        return AgentCRUD.to_read(agent_db)
+
+
+    @staticmethod
+    def to_read(agent_db: Agent) -> AgentRead:
+        """
+        Convert a database agent into its API model, rebuilding Token objects from the raw JSON.
+        """
         agent_data = agent_db.model_dump()
         
         # Convert raw JSON tokens to Token objects if they exist
         if agent_data.get('tokens'):
             agent_data['tokens'] = [Token(**token) for token in agent_data['tokens']]
         
-        agent_read = AgentRead(**agent_data)
-        return agent_read
+        return AgentRead(**agent_data)
     
 
     @staticmethod
@@ -205,7 +358,7 @@ class AgentCRUD(Database):
         
         agent_instance = Agent(**agent_data)
         created_agent = await Database.create(session, agent_instance)
-        agent_read = await AgentCRUD.get(session, created_agent.id)
+        agent_read = AgentCRUD.to_read(created_agent)
         
         # Trigger webhook for agent creation
         if agent_read:
@@ -221,8 +374,35 @@ class AgentCRUD(Database):
 
     @staticmethod
     async def update(session: AsyncSession, id: Union[int, str], update_data: AgentUpdate) -> AgentRead:
-        await Database.update(session, id, update_data, Agent)
-        return await AgentCRUD.get(session, id)
+        agent_db = await Database.update(session, id, update_data, Agent)
+        AgentCRUD.invalidate_config(id)
+        # Same result as a fresh AgentCRUD.get, without reading the row again
+        if agent_db.disabled:
+            return None
+        return AgentCRUD.to_read(agent_db)
+
+
+    @staticmethod
+    async def get_config(session: AsyncSession, id: int) -> AgentConfig | None:
+        """
+        Get the runtime config of an enabled agent, served from the per-process cache.
+        """
+        config = agent_config_cache.get(id)
+        if config is not None:
+            return config
+
+        agent_db = await Database.get(session, id, Agent)
+        if not agent_db:
+            return None
+
+        config = AgentConfig(**agent_db.model_dump())
+        agent_config_cache.set(id, config)
+        return config
+
+
+    @staticmethod
+    def invalidate_config(id: Union[int, str]) -> None:
+        agent_config_cache.pop(int(id))
 
 
     @staticmethod
@@ -249,16 +429,7 @@ class AgentCRUD(Database):
             agents = result.all()
             
             # Convert to AgentRead format
-            agent_reads = []
-            for agent_db in agents:
-                agent_data = agent_db.model_dump()
-                # Convert raw JSON tokens to Token objects if they exist
-                if agent_data.get('tokens'):
-                    agent_data['tokens'] = [Token(**token) for token in agent_data['tokens']]
-                agent_read = AgentRead(**agent_data)
-                agent_reads.append(agent_read)
-            
-            return agent_reads
+            return [AgentCRUD.to_read(agent_db) for agent_db in agents]
         except Exception as e:
             logger.error(f"Error getting all active agents: {e}")
             return []
\ No newline at end of file
@@ -0,0 +1,132 @@
+from typing import Callable, Optional
+
+from sqlalchemy import Connection, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from src.config import get_logger
+from src.db.model.agent import Agent
+from src.db.model.chat import Chat
+from src.db.model.message import Message
+
+logger = get_logger(__name__)
+
+# (model, column, server default for existing rows), in the order they were added
+COLUMNS: tuple[tuple[type, str, Optional[str]], ...] = (
+    (Agent, "context_token_budget", None),
+    (Agent, "response_cache_enabled", "0"),
+    (Agent, "checkpoint_retention", None),
+)
+
+# (model, index name) of indexes declared in the model's __table_args__
+INDEXES: tuple[tuple[type, str], ...] = (
+    (Message, "ix_message_chat_id_created_at_id"),
+    (Chat, "ix_chat_agent_id_id"),
+)
+
+
+def migrate(conn: Connection) -> None:
+    """
+    Bring tables created by an older version up to the current models.
+
+    `create_all` only creates missing tables, so columns and keys added later
+    are added here. Every step checks the live schema first, so this runs on
+    each startup and only changes what is missing.
+    """
+    for model, column, default in COLUMNS:
+        _add_column(conn, model, column, default)
+    for model, name in INDEXES:
+        _add_index(conn, model, name)
+    _add_chat_unique_key(conn)
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _keys(conn: Connection, table: str) -> set[str]:
+    inspector = inspect(conn)
+    # MySQL reports unique keys both as indexes and as unique constraints
+    return {index["name"] for index in inspector.get_indexes(table)} | {
+        constraint["name"] for constraint in inspector.get_unique_constraints(table)
+    }
+
+
+def _apply(description: str, done: Callable[[], bool], action: Callable[[], object]) -> None:
+    if done():
+        return
+    logger.info(f"Migrating: {description}")
+    try:
+        action()
+    except Exception:
+        # Another worker may have applied it in the meantime
+        if not done():
+            raise
+
+
+def _add_column(conn: Connection, model: type, column: str, default: Optional[str]) -> None:
+    table = model.__table__
+    definition = str(CreateColumn(table.c[column]).compile(dialect=conn.dialect))
+    if default is not None:
+        definition += f" DEFAULT {default}"
+    _apply(
+        f"add column {table.name}.{column}",
+        lambda: column in _columns(conn, table.name),
+        lambda: conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {definition}")),
+    )
+
+
+def _add_index(conn: Connection, model: type, name: str) -> None:
+    table = model.__table__
+    index = next(index for index in table.indexes if index.name == name)
+    _apply(
+        f"add index {table.name}.{name}",
+        lambda: name in _keys(conn, table.name),
+        lambda: index.create(conn),
+    )
+
+
+def _add_chat_unique_key(conn: Connection) -> None:
+    """
+    Add the (agent_id, platform_id, external_chat_id) key the chat upsert relies on.
+
+    Without it the upsert inserts a new chat on every cache miss, so startup
+    fails rather than running without it. Duplicate chats are merged first:
+    the lowest id is kept, which is the one the old lookup returned, and the
+    others' messages are moved to it.
+    """
+    name = "uq_chat_agent_platform_external"
+    columns = ", ".join(next(c for c in Chat.__table__.constraints if c.name == name).columns.keys())
+
+    def add() -> None:
+        _merge_duplicate_chats(conn)
+        # A unique index is a unique key in MySQL, and unlike ADD CONSTRAINT works everywhere
+        conn.execute(text(f"CREATE UNIQUE INDEX {name} ON chat ({columns})"))
+
+    _apply(f"add unique key chat.{name}", lambda: name in _keys(conn, "chat"), add)
+
+
+def _merge_duplicate_chats(conn: Connection) -> None:
+    duplicates = conn.execute(text(
+        "SELECT agent_id, platform_id, external_chat_id, MIN(id) AS keep_id FROM chat "
+        "WHERE external_chat_id IS NOT NULL "
+        "GROUP BY agent_id, platform_id, external_chat_id HAVING COUNT(*) > 1"
+    )).all()
+    for agent_id, platform_id, external_chat_id, keep_id in duplicates:
+        params = {
+            "agent_id": agent_id,
+            "platform_id": platform_id,
+            "external_chat_id": external_chat_id,
+            "keep_id": keep_id,
+        }
+        match = (
+            "agent_id = :agent_id AND platform_id = :platform_id "
+            "AND external_chat_id = :external_chat_id AND id <> :keep_id"
+        )
+        merged = [row[0] for row in conn.execute(text(f"SELECT id FROM chat WHERE {match}"), params)]
+        conn.execute(
+            text(f"UPDATE message SET chat_id = :keep_id WHERE chat_id IN (SELECT id FROM chat WHERE {match})"),
+            params,
+        )
+        conn.execute(text(f"DELETE FROM chat WHERE {match}"), params)
+        # Their checkpoint threads are left behind; the kept chat's thread carries on
+        logger.warning(f"Merged duplicate chats {merged} of agent {agent_id} into chat {keep_id}")
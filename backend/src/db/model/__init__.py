@@ -0,0 +1,10 @@
+from datetime import datetime, timezone
+
+
+def utc_now() -> datetime:
+    """
+    Current UTC time as a MySQL DATETIME column stores it: naive and in whole seconds.
+
+    Inserted rows are not read back, so this is also the value callers see.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
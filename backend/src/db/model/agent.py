@@ -1,10 +1,12 @@
 from typing import Optional, Any
-from datetime import datetime, timezone
+from datetime import datetime
 
 from sqlmodel import SQLModel, Field, Column
 from sqlalchemy import JSON
 from pydantic import ConfigDict
 
+from src.db.model import utc_now
+
 
 class AgentBase(SQLModel):
     model_config = ConfigDict(extra='forbid')
@@ -34,7 +36,10 @@ class Agent(AgentBase, table=True):
     system_prompt: str = Field(default=None, max_length=4096)
     disabled: bool = Field(default=False)
     tokens: Optional[Any] = Field(default=None, sa_column=Column(JSON))
-    created_at: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc))
+    context_token_budget: Optional[int] = Field(default=None)  # None uses settings.CONTEXT_TOKEN_BUDGET
+    response_cache_enabled: bool = Field(default=False)
+    checkpoint_retention: Optional[int] = Field(default=None)  # None uses settings.CHECKPOINT_RETENTION_KEEP, < 1 keeps every checkpoint
+    created_at: Optional[datetime] = Field(default_factory=utc_now)
 
 
 class AgentCreate(SQLModel):
@@ -62,6 +67,9 @@ class AgentCreate(SQLModel):
     image: Optional[str] = None
     system_prompt: str
     tokens: Optional[list[Token]] = Field(default=None)
+    context_token_budget: Optional[int] = None
+    response_cache_enabled: bool = False
+    checkpoint_retention: Optional[int] = None
 
 
 class AgentRead(SQLModel):
@@ -94,9 +102,24 @@ class AgentRead(SQLModel):
     system_prompt: str
     disabled: bool
     tokens: Optional[list[Token]] = Field(default=None)
+    context_token_budget: Optional[int] = None
+    response_cache_enabled: bool = False
+    checkpoint_retention: Optional[int] = None
     created_at: datetime
 
 
+class AgentConfig(SQLModel):
+    """
+    Runtime settings the chat pipeline reads from an agent.
+    """
+    model_config = ConfigDict(extra='ignore', frozen=True)
+
+    id: int
+    system_prompt: Optional[str] = None
+    context_token_budget: Optional[int] = None
+    response_cache_enabled: bool = False
+
+
 class AgentUpdate(SQLModel):
     model_config = ConfigDict(extra='forbid')
     
@@ -104,4 +127,7 @@ class AgentUpdate(SQLModel):
     image: Optional[str] = None
     system_prompt: Optional[str] = None
     disabled: Optional[bool] = None
-    tokens: Optional[list[Token]] = Field(default=None)
\ No newline at end of file
+    tokens: Optional[list[Token]] = Field(default=None)
+    context_token_budget: Optional[int] = None
+    response_cache_enabled: Optional[bool] = None
+    checkpoint_retention: Optional[int] = None
@@ -1,9 +1,12 @@
 from typing import Optional
-from datetime import datetime, timezone
+from datetime import datetime
 
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import SQLModel, Field
 from pydantic import ConfigDict
 
+from src.db.model import utc_now
+
 
 class ChatBase(SQLModel):
     model_config = ConfigDict(extra='forbid')
@@ -16,13 +19,19 @@ class ChatBase(SQLModel):
 
 class Chat(ChatBase, table=True):
     model_config = ConfigDict(extra='ignore')
+    __table_args__ = (
+        # One chat per conversation on a platform, the target of the chat upsert
+        UniqueConstraint("agent_id", "platform_id", "external_chat_id", name="uq_chat_agent_platform_external"),
+        # Keyset pagination of an agent's chats
+        Index("ix_chat_agent_id_id", "agent_id", "id"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
-    external_chat_id: Optional[int] = Field(default=None, index=True, sa_column_kwargs={"index": True})  # Telegram/WhatsApp chat ID
+    external_chat_id: Optional[int] = Field(default=None)  # Telegram/WhatsApp chat ID
     user_id: int = Field(foreign_key="user.id")
     agent_id: int = Field(foreign_key="agent.id")
     platform_id: int = Field(foreign_key="platform.id")
-    created_at: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: Optional[datetime] = Field(default_factory=utc_now)
 
 
 class ChatCreate(SQLModel):
@@ -1,10 +1,13 @@
 from typing import Optional
-from datetime import datetime, timezone
+from datetime import datetime
 from enum import Enum, auto
 
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 from pydantic import ConfigDict
 
+from src.db.model import utc_now
+
 class MessageRole(Enum):
     CLIENT = auto()
     AGENT = auto()
@@ -28,13 +31,15 @@ class MessageBase(SQLModel):
 
 class Message(MessageBase, table=True):
     model_config = ConfigDict(extra='ignore')
+    # Serves history reads and keyset pagination of a chat without a filesort
+    __table_args__ = (Index("ix_message_chat_id_created_at_id", "chat_id", "created_at", "id"),)
     
     id: Optional[int] = Field(default=None, primary_key=True)
     chat_id: int = Field(foreign_key="chat.id")
     text: str = Field(max_length=4096)
     client_name: Optional[str] = Field(default=None)
     role: MessageRole = Field(default=MessageRole.USER, index=True)
-    created_at: Optional[datetime] = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: Optional[datetime] = Field(default_factory=utc_now)
 
 
 class MessageCreate(SQLModel):
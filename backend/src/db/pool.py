@@ -0,0 +1,70 @@
+import time
+from typing import Optional
+
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+from src.config import settings, get_logger
+from src.utils.metrics import Counter, Gauge, Histogram
+
+logger = get_logger(__name__)
+
+_engine: Optional[AsyncEngine] = None
+
+
+def _pool_status(name: str) -> float:
+    if _engine is None:
+        return 0
+    pool = _engine.sync_engine.pool
+    return getattr(pool, name)() if hasattr(pool, name) else 0
+
+
+checkout_seconds = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to get a connection from the pool, including waits for a free one and pre-ping",
+)
+checkout_timeouts = Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after DATABASE_POOL_TIMEOUT")
+connections_opened = Counter("db_pool_connections_opened_total", "New database connections opened by the pool")
+connections_invalidated = Counter(
+    "db_pool_connections_invalidated_total",
+    "Connections discarded as broken, including failed pre-pings",
+)
+checked_out = Gauge("db_pool_checked_out_connections", "Connections currently in use", fn=lambda: _pool_status("checkedout"))
+idle = Gauge("db_pool_idle_connections", "Open connections waiting in the pool", fn=lambda: _pool_status("checkedin"))
+max_connections = Gauge(
+    "db_pool_max_connections",
+    "Connections the pool may open (size + overflow)",
+    fn=lambda: settings.DATABASE_POOL_SIZE + max(settings.DATABASE_POOL_MAX_OVERFLOW, 0),
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool that times every checkout and counts the ones that time out.
+
+    SQLAlchemy's pool events fire once a connection is handed out, so the wait
+    in front of them is measured here.
+    """
+
+    def connect(self) -> PoolProxiedConnection:
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            checkout_timeouts.inc()
+            logger.warning(f"Database pool exhausted: {self.status()}")
+            raise
+        finally:
+            checkout_seconds.observe(time.perf_counter() - start)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Export pool metrics for the engine; the listeners follow the pool across dispose().
+    """
+    global _engine
+    _engine = engine
+
+    event.listen(engine.sync_engine, "connect", lambda *_: connections_opened.inc())
+    event.listen(engine.sync_engine, "invalidate", lambda *_: connections_invalidated.inc())
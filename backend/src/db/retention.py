@@ -0,0 +1,279 @@
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional, Sequence
+
+import aiomysql
+from sqlmodel import select
+
+from src.config import settings, get_logger
+from src.db.checkpointer import get_checkpoint_pool
+from src.db.model.agent import Agent
+from src.db.model.chat import Chat
+from src.db.session import get_session
+from src.utils.metrics import Counter, Histogram
+
+logger = get_logger(__name__)
+
+CHECKPOINT_TABLES = ("checkpoints", "checkpoint_writes", "checkpoint_blobs")
+
+
+@dataclass
+class RetentionReport:
+    threads: int = 0
+    rows: dict[str, int] = field(default_factory=lambda: dict.fromkeys(CHECKPOINT_TABLES, 0))
+    bytes: dict[str, int] = field(default_factory=lambda: dict.fromkeys(CHECKPOINT_TABLES, 0))
+
+
+class CheckpointRetention:
+    """
+    Background job that prunes old LangGraph checkpoints.
+
+    Every `interval` seconds it keeps the latest `keep` checkpoints of each thread
+    (an agent's `checkpoint_retention` overrides it) and deletes older checkpoints,
+    their pending writes and the channel blobs no kept checkpoint references.
+    Deletes go by primary key in batches of `batch_size` rows, each autocommitted,
+    with a pause in between so live chats are never blocked for long.
+    """
+
+    def __init__(self, keep: int, interval: float, batch_size: int, batch_pause: float) -> None:
+        self.keep = keep
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.last_report: Optional[RetentionReport] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.run_seconds = Histogram(
+            "checkpoint_retention_run_seconds",
+            "Duration of a checkpoint pruning run",
+            buckets=(1.0, 5.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+        )
+        self.rows_deleted = Counter(
+            "checkpoint_retention_rows_deleted_total",
+            "Checkpoint rows deleted by the retention job",
+            labels=("table",),
+        )
+        self.bytes_reclaimed = Counter(
+            "checkpoint_retention_bytes_reclaimed_total",
+            "Checkpoint payload bytes deleted by the retention job",
+            labels=("table",),
+        )
+
+    async def start(self) -> None:
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="checkpoint-retention")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Checkpoint retention run failed")
+
+    async def run_once(self) -> RetentionReport:
+        """
+        Prune every thread that holds more checkpoints than its retention allows.
+        """
+        report = RetentionReport()
+        start = time.perf_counter()
+
+        overrides = await self._agent_overrides()
+        limits = [keep for keep in (self.keep, *overrides) if keep >= 1]
+        if limits:
+            async for thread_id, ns_hash, keep in self._candidates(min(limits)):
+                if keep < 1:
+                    continue
+                await self._prune_thread(thread_id, ns_hash, keep, report)
+
+        elapsed = time.perf_counter() - start
+        self.run_seconds.observe(elapsed)
+        self.last_report = report
+        logger.info(
+            f"Checkpoint retention pruned {report.threads} thread(s) in {elapsed:.1f}s: "
+            + ", ".join(f"{table}={report.rows[table]} rows/{report.bytes[table]} bytes" for table in CHECKPOINT_TABLES)
+        )
+        return report
+
+    async def _agent_overrides(self) -> list[int]:
+        async with get_session() as session:
+            result = await session.exec(
+                select(Agent.checkpoint_retention).where(Agent.checkpoint_retention != None).distinct()
+            )
+            return list(result.all())
+
+    async def _thread_limits(self, thread_ids: Sequence[str]) -> dict[str, int]:
+        """
+        Resolve each thread's retention through its chat's agent.
+        """
+        chat_ids = [int(thread_id) for thread_id in thread_ids if thread_id.isdigit()]
+        limits = dict.fromkeys(thread_ids, self.keep)
+        if not chat_ids:
+            return limits
+
+        async with get_session() as session:
+            result = await session.exec(
+                select(Chat.id, Agent.checkpoint_retention)
+                .join(Agent, Agent.id == Chat.agent_id)
+                .where(Chat.id.in_(chat_ids), Agent.checkpoint_retention != None)
+            )
+            for chat_id, keep in result.all():
+                limits[str(chat_id)] = keep
+        return limits
+
+    async def _candidates(self, min_keep: int):
+        """
+        Yield (thread_id, checkpoint_ns_hash, keep) for threads with more than
+        `min_keep` checkpoints, paging through the primary key prefix.
+        """
+        last_key = ("", b"")
+        while True:
+            rows = await self._fetch(
+                "SELECT thread_id, checkpoint_ns_hash, COUNT(*) AS total FROM checkpoints "
+                "WHERE (thread_id, checkpoint_ns_hash) > (%s, %s) GROUP BY thread_id, checkpoint_ns_hash "
+                "HAVING total > %s ORDER BY thread_id, checkpoint_ns_hash LIMIT %s",
+                (*last_key, min_keep, self.batch_size),
+            )
+            if not rows:
+                return
+
+            limits = await self._thread_limits(list({row["thread_id"] for row in rows}))
+            for row in rows:
+                keep = limits[row["thread_id"]]
+                if row["total"] > keep:
+                    yield row["thread_id"], row["checkpoint_ns_hash"], keep
+
+            if len(rows) < self.batch_size:
+                return
+            last_key = (rows[-1]["thread_id"], rows[-1]["checkpoint_ns_hash"])
+
+    async def _prune_thread(self, thread_id: str, ns_hash: bytes, keep: int, report: RetentionReport) -> None:
+        rows = await self._fetch(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = %s AND checkpoint_ns_hash = %s "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET %s",
+            (thread_id, ns_hash, keep - 1),
+        )
+        if not rows:
+            return
+        # Checkpoint ids are time ordered, so everything below the oldest kept id goes
+        cutoff = rows[0]["checkpoint_id"]
+
+        # Read blob keys before the kept checkpoints: a checkpoint committed in
+        # between then adds references instead of losing its blobs
+        blobs = await self._fetch(
+            "SELECT channel, version, LENGTH(`blob`) AS size FROM checkpoint_blobs "
+            "WHERE thread_id = %s AND checkpoint_ns_hash = %s",
+            (thread_id, ns_hash),
+        )
+
+        await self._delete_older(
+            "checkpoint_writes", ("checkpoint_id", "task_id", "idx"), "LENGTH(`blob`)",
+            thread_id, ns_hash, cutoff, report,
+        )
+        await self._delete_older(
+            "checkpoints", ("checkpoint_id",), "LENGTH(checkpoint) + LENGTH(metadata)",
+            thread_id, ns_hash, cutoff, report,
+        )
+
+        kept = await self._fetch(
+            "SELECT JSON_EXTRACT(checkpoint, '$.channel_versions') AS versions FROM checkpoints "
+            "WHERE thread_id = %s AND checkpoint_ns_hash = %s AND checkpoint_id >= %s",
+            (thread_id, ns_hash, cutoff),
+        )
+        referenced = {
+            (channel, str(version))
+            for row in kept
+            for channel, version in json.loads(row["versions"] or "{}").items()
+        }
+        unreferenced = [blob for blob in blobs if (blob["channel"], blob["version"]) not in referenced]
+        for start in range(0, len(unreferenced), self.batch_size):
+            batch = unreferenced[start:start + self.batch_size]
+            await self._delete_keys("checkpoint_blobs", ("channel", "version"), thread_id, ns_hash, batch, report)
+
+        report.threads += 1
+
+    async def _delete_older(
+        self,
+        table: str,
+        key_columns: tuple[str, ...],
+        size_expr: str,
+        thread_id: str,
+        ns_hash: bytes,
+        cutoff: str,
+        report: RetentionReport,
+    ) -> None:
+        columns = ", ".join(key_columns)
+        while True:
+            rows = await self._fetch(
+                f"SELECT {columns}, {size_expr} AS size FROM {table} "
+                "WHERE thread_id = %s AND checkpoint_ns_hash = %s AND checkpoint_id < %s "
+                f"ORDER BY {columns} LIMIT %s",
+                (thread_id, ns_hash, cutoff, self.batch_size),
+            )
+            if not rows:
+                return
+            await self._delete_keys(table, key_columns, thread_id, ns_hash, rows, report)
+            if len(rows) < self.batch_size:
+                return
+
+    async def _delete_keys(
+        self,
+        table: str,
+        key_columns: tuple[str, ...],
+        thread_id: str,
+        ns_hash: bytes,
+        rows: list[dict[str, Any]],
+        report: RetentionReport,
+    ) -> None:
+        row_placeholder = "(" + ", ".join(["%s"] * len(key_columns)) + ")"
+        args = [thread_id, ns_hash]
+        for row in rows:
+            args.extend(row[column] for column in key_columns)
+
+        deleted = await self._execute(
+            f"DELETE FROM {table} WHERE thread_id = %s AND checkpoint_ns_hash = %s "
+            f"AND ({', '.join(key_columns)}) IN ({', '.join([row_placeholder] * len(rows))})",
+            args,
+        )
+        size = sum(row["size"] or 0 for row in rows)
+
+        report.rows[table] += deleted
+        report.bytes[table] += size
+        self.rows_deleted.inc(deleted, table=table)
+        self.bytes_reclaimed.inc(size, table=table)
+
+        if self.batch_pause > 0:
+            await asyncio.sleep(self.batch_pause)
+
+    async def _fetch(self, sql: str, args: Sequence[Any]) -> list[dict[str, Any]]:
+        async with get_checkpoint_pool().acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(sql, args)
+                return list(await cur.fetchall())
+
+    async def _execute(self, sql: str, args: Sequence[Any]) -> int:
+        async with get_checkpoint_pool().acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, args)
+                return cur.rowcount
+
+
+checkpoint_retention = CheckpointRetention(
+    keep=settings.CHECKPOINT_RETENTION_KEEP,
+    interval=settings.CHECKPOINT_RETENTION_INTERVAL,
+    batch_size=settings.CHECKPOINT_RETENTION_BATCH_SIZE,
+    batch_pause=settings.CHECKPOINT_RETENTION_BATCH_PAUSE,
+)
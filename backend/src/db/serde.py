@@ -0,0 +1,63 @@
+import zlib
+from typing import Any, Callable
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from src.config import get_logger
+
+try:
+    import zstandard
+except ImportError:  # Optional, installed with langsmith in the default environment
+    zstandard = None
+
+logger = get_logger(__name__)
+
+Codec = tuple[Callable[[bytes, int], bytes], Callable[[bytes], bytes]]
+
+_CODECS: dict[str, Codec] = {
+    "zlib": (lambda data, level: zlib.compress(data, level), zlib.decompress),
+}
+if zstandard is not None:
+    _CODECS["zstd"] = (lambda data, level: zstandard.compress(data, level), zstandard.decompress)
+
+
+class CompressedSerializer(JsonPlusSerializer):
+    """
+    LangGraph's msgpack serializer with compressed payloads.
+
+    Payloads of at least `min_size` bytes are compressed with `codec` when that
+    makes them smaller, and the codec is appended to the stored type
+    (e.g. "msgpack+zstd"). Any known codec is decompressed on load, so the
+    setting can change without rewriting existing checkpoints.
+    """
+
+    def __init__(self, codec: str = "zstd", level: int = 3, min_size: int = 256) -> None:
+        super().__init__()
+        if codec == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, compressing checkpoints with zlib instead")
+            codec = "zlib"
+        if codec not in _CODECS and codec != "none":
+            raise ValueError(f"Unknown checkpoint compression '{codec}', expected none, zlib or zstd")
+
+        self.codec = None if codec == "none" else codec
+        self.level = level
+        self.min_size = min_size
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = super().dumps_typed(obj)
+        if self.codec is None or len(data) < self.min_size:
+            return type_, data
+
+        compressed = _CODECS[self.codec][0](data, self.level)
+        if len(compressed) >= len(data):
+            return type_, data
+        return f"{type_}+{self.codec}", compressed
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        type_, _, codec = type_.partition("+")
+        if codec:
+            if codec not in _CODECS:
+                raise ValueError(f"Checkpoint compressed with unavailable codec '{codec}'")
+            payload = _CODECS[codec][1](payload)
+        return super().loads_typed((type_, payload))
@@ -5,13 +5,24 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from langgraph.checkpoint.mysql.aio import AIOMySQLSaver
-
 from src.config import settings
 from src.db.crud import Database
+from src.db.checkpointer import close_checkpointer
+from src.db.migrations import migrate
 from src.db.model.platform import Platform, platform_dict
-
-engine = create_async_engine(settings.DATABASE_URL, isolation_level="AUTOCOMMIT")
+from src.db.pool import InstrumentedQueuePool, instrument_engine
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    isolation_level="AUTOCOMMIT",
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_POOL_MAX_OVERFLOW,
+    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+    pool_pre_ping=settings.DATABASE_POOL_PRE_PING,
+)
+instrument_engine(engine)
 
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -35,12 +46,12 @@ async def populate_db():
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
-
-    async with AIOMySQLSaver.from_conn_string(settings.DATABASE_URL) as checkpointer:
-        await checkpointer.setup()
+        # Columns and keys added to existing tables since they were created
+        await conn.run_sync(migrate)
 
 
 async def close_db():
+    await close_checkpointer()
     await engine.dispose()
 
 
@@ -0,0 +1,187 @@
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import insert
+
+from src.config import settings, get_logger
+from src.db.model.message import Message
+from src.db.session import get_session
+from src.utils.metrics import Counter, Gauge, Histogram
+
+logger = get_logger(__name__)
+
+
+class MessageWriter:
+    """
+    Write-behind queue for chat messages.
+
+    `submit` returns as soon as the messages are queued; a background task drains
+    the queue and stores each batch with a single multi-row INSERT. The queue is
+    bounded, so when it is full `submit` waits for room instead of growing memory.
+    `wait_for_chat` lets readers of the Message table wait until a chat's queued
+    messages are stored. Failed batches are retried up to `max_attempts` times,
+    which also slows the drain and pushes back on `submit` while the database is
+    unavailable.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        max_attempts: int = 5,
+        retry_backoff: float = 0.5,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max(max_attempts, 1)
+        self.retry_backoff = retry_backoff
+        # The future is set on the last message of each `submit` call
+        self._queue: asyncio.Queue[tuple[Message, Optional[asyncio.Future]]] = asyncio.Queue(maxsize=max_size)
+        # Last queued submit per chat, awaited before reading that chat's history
+        self._last_write: dict[int, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.queue_depth = Gauge(
+            "message_write_queue_depth",
+            "Messages waiting to be written",
+            fn=self._queue.qsize,
+        )
+        self.flush_seconds = Histogram(
+            "message_write_flush_seconds",
+            "Time spent writing one batch of messages",
+        )
+        self.written = Counter("messages_written_total", "Messages written to the database")
+        self.retried = Counter("message_write_retries_total", "Messages in batches that had to be retried")
+        self.failed = Counter("message_write_failures_total", "Messages dropped after every write attempt failed")
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="message-writer")
+
+    async def stop(self) -> None:
+        """
+        Flush everything still queued and stop the background task.
+        """
+        if not self.running:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def submit(self, *messages: Message) -> None:
+        # Without the background task (scripts, shutdown) write straight through
+        if not self.running:
+            await self._flush(list(messages))
+            return
+
+        if not messages:
+            return
+
+        chat_id = messages[-1].chat_id
+        done = asyncio.get_running_loop().create_future()
+        self._last_write[chat_id] = done
+        for message in messages[:-1]:
+            await self._queue.put((message, None))
+        await self._queue.put((messages[-1], done))
+
+    async def wait_for_chat(self, chat_id: int) -> None:
+        """
+        Wait until every message queued for the chat has been written (or dropped after every retry failed).
+        """
+        done = self._last_write.get(chat_id)
+        if done is not None:
+            await asyncio.wait([done])
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+
+            # Linger briefly so bursts end up in the same INSERT
+            if self._queue.qsize() < self.batch_size - 1 and self.flush_interval > 0:
+                await asyncio.sleep(self.flush_interval)
+
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._flush([message for message, _ in batch])
+            finally:
+                for message, done in batch:
+                    if done is not None:
+                        done.set_result(None)
+                        if self._last_write.get(message.chat_id) is done:
+                            del self._last_write[message.chat_id]
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[Message]) -> None:
+        """
+        Write a batch, retrying with exponential backoff.
+
+        Once the attempts run out, the rows are written one at a time so a single
+        bad row cannot take the rest of the batch with it; only rows that still
+        fail are dropped, and each one is logged.
+        """
+        if not batch:
+            return
+
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logger.error(f"Giving up on batch of {len(batch)} messages after {attempt} attempts: {e}")
+                    break
+                delay = self.retry_backoff * 2 ** (attempt - 1)
+                logger.warning(f"Error writing batch of {len(batch)} messages (attempt {attempt}), retrying in {delay:.2f}s: {e}")
+                self.retried.inc(len(batch))
+                await asyncio.sleep(delay)
+            else:
+                self.written.inc(len(batch))
+                return
+
+        if len(batch) == 1:
+            self._drop(batch[0])
+            return
+
+        for message in batch:
+            try:
+                await self._insert([message])
+            except Exception:
+                self._drop(message)
+            else:
+                self.written.inc()
+
+    async def _insert(self, batch: list[Message]) -> None:
+        rows = [message.model_dump(exclude={"id"}) for message in batch]
+        start = time.perf_counter()
+        try:
+            async with get_session() as session:
+                await session.exec(insert(Message).values(rows))
+                await session.commit()
+        finally:
+            self.flush_seconds.observe(time.perf_counter() - start)
+
+    def _drop(self, message: Message) -> None:
+        self.failed.inc()
+        logger.error(
+            f"Dropped message for chat {message.chat_id}: role={message.role.name} "
+            f"created_at={message.created_at} client_name={message.client_name!r} text={message.text!r}"
+        )
+
+message_writer = MessageWriter(
+    max_size=settings.MESSAGE_QUEUE_MAX_SIZE,
+    batch_size=settings.MESSAGE_BATCH_SIZE,
+    flush_interval=settings.MESSAGE_FLUSH_INTERVAL,
+    max_attempts=settings.MESSAGE_WRITE_MAX_ATTEMPTS,
+    retry_backoff=settings.MESSAGE_WRITE_RETRY_BACKOFF,
+)
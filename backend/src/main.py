@@ -4,22 +4,43 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from src.config import settings
 from src.db.session import init_db, close_db, populate_db
+from src.db.checkpointer import init_checkpointer
+from src.db.writer import message_writer
+from src.db.retention import checkpoint_retention
+from src.agent.graph import graph_registry
+from src.controllers.jobs import chat_job_runner
 
 from src.routers.user import router as user_router
 from src.routers.auth import router as auth_router
 from src.routers.agent import router as agent_router
 from src.routers.chat import router as chat_router
+from src.routers.metrics import router as metrics_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Initializing  database
     await init_db()
+    # Shared LangGraph checkpointer backed by a connection pool
+    await init_checkpointer()
+    # Compile the agent graph once so requests reuse it
+    await graph_registry.get()
     # Populate database with initial data
     await populate_db()
+    # Background writer for chat messages
+    await message_writer.start()
+    # Workers for asynchronous chat jobs
+    await chat_job_runner.start()
+    # Periodic pruning of old checkpoints
+    await checkpoint_retention.start()
     
     yield
 
+    await checkpoint_retention.stop()
+    await chat_job_runner.stop()
+    # Flush queued messages before the database goes away
+    await message_writer.stop()
+    graph_registry.clear()
     # Closing database
     await close_db()
 
@@ -42,3 +63,4 @@ app.include_router(auth_router, prefix=f"{settings.API_PREFIX}/auth", tags=["Aut
 app.include_router(user_router, prefix=f"{settings.API_PREFIX}/user", tags=["User"])
 app.include_router(agent_router, prefix=f"{settings.API_PREFIX}/agent", tags=["Agent"])
 app.include_router(chat_router, prefix=f"{settings.API_PREFIX}/chat", tags=["Chat"])
+app.include_router(metrics_router, prefix=settings.API_PREFIX, tags=["Metrics"])
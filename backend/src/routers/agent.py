@@ -1,5 +1,7 @@
-from typing import Annotated
+import json
+from typing import Annotated, AsyncIterator
 from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi.responses import StreamingResponse
 
 from sqlmodel.ext.asyncio.session import AsyncSession
 
@@ -9,7 +11,9 @@ from src.db.model.user import User
 from src.db.model.message import MessageCreate
 from src.db.model.chat import ChatCreate
 from src.db.crud import AgentCRUD as Database
-from src.controllers.chat import process_message
+from src.controllers.chat import process_message, stream_message
+from src.controllers.jobs import chat_job_runner
+from src.schemas.chat import ChatJob
 from src.utils.auth import get_current_active_user
 
 router = APIRouter()
@@ -100,16 +104,59 @@ async def get_agent_by_user(user_id: str, session: Annotated[AsyncSession, Depen
 
 
 @router.post("/chat/", status_code=status.HTTP_200_OK)
-async def chat_with_agent(
-    chat: ChatCreate,
-    message: MessageCreate,
-    session: Annotated[AsyncSession, Depends(get_session_dep)]
-):
+async def chat_with_agent(chat: ChatCreate, message: MessageCreate):
     """
     Endpoint to handle chat messages with an agent.
+
+    No request-scoped session: the pipeline opens short sessions around its
+    queries, so a connection is never held while the LLM answers.
     """
-    response = await process_message(session, chat, message)
+    response = await process_message(chat, message)
     
+    # A coalesced message was answered together with a later one of its chat
     return {
-        "response": response
-    }
\ No newline at end of file
+        "response": response,
+        "coalesced": response is None,
+    }
+
+
+async def _sse(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for event in events:
+        name = next(iter(event))
+        yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream/", status_code=status.HTTP_200_OK)
+async def stream_chat_with_agent(chat: ChatCreate, message: MessageCreate):
+    """
+    Streaming variant of /chat/: sends the response as Server-Sent Events.
+
+    Emits `token` events while the LLM generates, then a final `response` event
+    (or `error`) with the full text after the message is queued for saving.
+    """
+    events = await stream_message(chat, message)
+
+    return StreamingResponse(
+        _sse(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/chat/async/", response_model=ChatJob, status_code=status.HTTP_202_ACCEPTED)
+async def chat_with_agent_async(chat: ChatCreate, message: MessageCreate):
+    """
+    Queue a chat message and return a job id right away.
+
+    The response is POSTed to CHAT_JOB_CALLBACK_URL when ready and can also be
+    polled at /chat/jobs/{job_id}.
+    """
+    return chat_job_runner.submit(chat, message)
+
+
+@router.get("/chat/jobs/{job_id}", response_model=ChatJob, status_code=status.HTTP_200_OK)
+async def get_chat_job(job_id: str):
+    job = chat_job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
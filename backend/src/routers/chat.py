@@ -1,3 +1,47 @@
-from fastapi import APIRouter
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, Query, status, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.session import get_session_dep
+from src.db.model.user import User
+from src.db.crud import ChatCRUD, MessageCRUD
+from src.schemas.chat import ChatPage, MessagePage
+from src.utils.auth import get_current_active_user
 
 router = APIRouter()
+
+
+@router.get("/agent/{agent_id}", response_model=ChatPage, status_code=status.HTTP_200_OK)
+async def get_chats_by_agent(
+    agent_id: int,
+    session: Annotated[AsyncSession, Depends(get_session_dep)],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    before: Optional[str] = None,
+):
+    """
+    List an agent's chats, newest first. Pass `before` from a page to get the next one.
+    """
+    return await ChatCRUD.get_page_by_agent(session, current_user.id, agent_id, limit, before)
+
+
+@router.get("/{chat_id}/messages", response_model=MessagePage, status_code=status.HTTP_200_OK)
+async def get_chat_messages(
+    chat_id: int,
+    session: Annotated[AsyncSession, Depends(get_session_dep)],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+):
+    """
+    Read a chat's messages, oldest first within a page.
+
+    Without a cursor the latest messages are returned. Pass a page's `before`
+    to go back in time, or its `after` to get (or poll for) newer messages.
+    """
+    chat = await ChatCRUD.get_for_user(session, chat_id, current_user.id)
+    if not chat:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found")
+    return await MessageCRUD.get_page(session, chat_id, limit, before, after)
@@ -0,0 +1,37 @@
+from enum import StrEnum
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from src.db.model.chat import ChatRead
+from src.db.model.message import MessageRead
+
+
+class ChatJobStatus(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class ChatJob(BaseModel):
+    id: str
+    status: ChatJobStatus = ChatJobStatus.PENDING
+    response: Optional[str] = None
+    coalesced: bool = False  # Answered together with a later message of the chat, nothing to send
+    error: Optional[str] = None  # Why a failed job failed
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class MessagePage(BaseModel):
+    items: list[MessageRead]  # Oldest first
+    before: Optional[str] = None  # Cursor for older messages, None at the start of the chat
+    after: Optional[str] = None  # Cursor for newer messages, also used to poll for new ones
+    has_newer: bool = False  # Whether newer messages already exist past `after`
+
+
+class ChatPage(BaseModel):
+    items: list[ChatRead]  # Newest first
+    before: Optional[str] = None  # Cursor for older chats, None on the last page
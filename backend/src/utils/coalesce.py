@@ -0,0 +1,73 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass
+class _Batch(Generic[T]):
+    last_arrival: float
+    items: list[T] = field(default_factory=list)
+
+
+class Coalescer(Generic[K, T, R]):
+    """
+    Debounces items per key and processes each burst with a single call.
+
+    A burst is collected until no new item has arrived for `window` seconds (but
+    no longer than `max_wait` in total), then `run` is called with every item
+    collected so far. Only the caller whose item closed the burst receives the
+    result (or the exception `run` raised); the others get None, as their items
+    were answered by that call.
+
+    The burst runs in its own task, so a cancelled caller doesn't take the
+    other callers' items down with it.
+    """
+
+    def __init__(self, window: float, max_wait: float) -> None:
+        self.window = window
+        self.max_wait = max(max_wait, window)
+        self._pending: dict[K, tuple[_Batch[T], asyncio.Task]] = {}
+        self._running: set[asyncio.Task] = set()
+
+    async def submit(self, key: K, item: T, run: Callable[[list[T]], Awaitable[R]]) -> Optional[R]:
+        loop = asyncio.get_running_loop()
+
+        if key in self._pending:
+            batch, task = self._pending[key]
+        else:
+            batch = _Batch(last_arrival=loop.time())
+            task = asyncio.create_task(self._run(key, batch, run))
+            self._pending[key] = (batch, task)
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        batch.items.append(item)
+        batch.last_arrival = loop.time()
+        position = len(batch.items)
+
+        try:
+            result = await asyncio.shield(task)
+        except Exception:
+            if position == len(batch.items):
+                raise
+            return None
+        return result if position == len(batch.items) else None
+
+    async def _run(self, key: K, batch: _Batch[T], run: Callable[[list[T]], Awaitable[R]]) -> R:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        try:
+            while True:
+                delay = min(batch.last_arrival + self.window, deadline) - loop.time()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+        finally:
+            # Items arriving from now on start the next burst
+            del self._pending[key]
+
+        return await run(batch.items)
@@ -0,0 +1,48 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Generic, Hashable, Optional, TypeVar
+
+from src.utils.metrics import Histogram
+
+K = TypeVar("K", bound=Hashable)
+
+
+class KeyedLock(Generic[K]):
+    """
+    One asyncio.Lock per key, created on demand and dropped once nobody holds or
+    waits for it.
+
+    Holders of the same key run one at a time in arrival order; different keys
+    never block each other.
+    """
+
+    def __init__(self, wait_seconds: Optional[Histogram] = None) -> None:
+        # key -> [lock, holders + waiters]
+        self._locks: dict[K, list] = {}
+        self._wait_seconds = wait_seconds
+
+    @asynccontextmanager
+    async def acquire(self, key: K) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+
+        start = time.perf_counter()
+        try:
+            async with entry[0]:
+                if self._wait_seconds is not None:
+                    self._wait_seconds.observe(time.perf_counter() - start)
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    def locked(self, key: K) -> bool:
+        entry = self._locks.get(key)
+        return entry is not None and entry[0].locked()
+
+    def __len__(self) -> int:
+        return len(self._locks)
@@ -0,0 +1,7 @@
+import os
+
+# Required settings, so the modules under test import without a .env
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("LOGGING_LEVEL", "WARNING")
+os.environ.setdefault("LLM_PROVIDER", "fake")
@@ -0,0 +1,55 @@
+import asyncio
+import unittest
+
+from src.utils.cache import SingleFlight
+
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.flight: SingleFlight[str, int] = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def resolve(self) -> int:
+        self.calls += 1
+        await self.release.wait()
+        return 42
+
+    async def test_concurrent_callers_share_one_call(self):
+        callers = [asyncio.create_task(self.flight.do("chat", self.resolve)) for _ in range(3)]
+        await asyncio.sleep(0)
+        self.release.set()
+
+        self.assertEqual(await asyncio.gather(*callers), [42, 42, 42])
+        self.assertEqual(self.calls, 1)
+
+    async def test_cancelled_leader_does_not_cancel_waiters(self):
+        leader = asyncio.create_task(self.flight.do("chat", self.resolve))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(self.flight.do("chat", self.resolve))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        self.release.set()
+
+        self.assertEqual(await waiter, 42)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(self.calls, 1)
+
+    async def test_failure_reaches_every_caller_and_is_not_cached(self):
+        async def fail() -> int:
+            await self.release.wait()
+            raise ValueError("no chat")
+
+        callers = [asyncio.create_task(self.flight.do("chat", fail)) for _ in range(2)]
+        await asyncio.sleep(0)
+        self.release.set()
+
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(await self.flight.do("chat", self.resolve), 42)
+
+
+if __name__ == "__main__":
+    unittest.main()
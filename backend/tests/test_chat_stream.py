@@ -0,0 +1,44 @@
+import json
+import unittest
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.controllers import chat as chat_controller
+from src.controllers.chat import ERROR_RESPONSE
+from src.routers.agent import router
+
+
+@asynccontextmanager
+async def no_session():
+    yield None
+
+
+class StreamUnknownAgentTest(unittest.TestCase):
+    def setUp(self) -> None:
+        app = FastAPI()
+        app.include_router(router, prefix="/agent")
+        self.client = TestClient(app)
+
+        for patcher in (
+            patch.object(chat_controller, "resolve_chat_id", AsyncMock(return_value=1)),
+            patch.object(chat_controller, "get_session", no_session),
+            patch.object(chat_controller.AgentCRUD, "get_config", AsyncMock(return_value=None)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_unknown_agent_streams_an_error_event(self):
+        response = self.client.post("/agent/chat/stream/", json={
+            "chat": {"id": 5, "agent_id": 404, "platform_id": 1, "user_id": 1},
+            "message": {"text": "hi", "client_name": "user"},
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, f"event: error\ndata: {json.dumps({'error': ERROR_RESPONSE})}\n\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import InMemorySaver
+
+from src.db.checkpointer import TieredCheckpointer
+
+
+class FlakySaver(InMemorySaver):
+    """
+    In-memory saver whose writes fail while `down` is set.
+    """
+
+    down = False
+
+    async def aput(self, *args, **kwargs):
+        if self.down:
+            raise ConnectionError("mysql down")
+        return await super().aput(*args, **kwargs)
+
+    async def aput_writes(self, *args, **kwargs):
+        if self.down:
+            raise ConnectionError("mysql down")
+        return await super().aput_writes(*args, **kwargs)
+
+
+def make_checkpoint(messages: list[str], version: int) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages}
+    checkpoint["channel_versions"] = {"messages": str(version)}
+    return checkpoint
+
+
+class TieredCheckpointerFailedWriteTest(unittest.IsolatedAsyncioTestCase):
+    thread = {"configurable": {"thread_id": "1", "checkpoint_ns": ""}}
+
+    async def asyncSetUp(self) -> None:
+        self.saver = FlakySaver()
+
+    async def make_checkpointer(self, strict: bool) -> TieredCheckpointer:
+        checkpointer = TieredCheckpointer(self.saver, max_size=10, ttl=None, strict=strict, queue_size=10, batch_size=10)
+        await checkpointer.start()
+        self.addAsyncCleanup(checkpointer.stop)
+        return checkpointer
+
+    async def put(self, checkpointer: TieredCheckpointer, config: dict, messages: list[str], version: int) -> dict:
+        return await checkpointer.aput(config, make_checkpoint(messages, version), {}, {"messages": str(version)})
+
+    async def cached_messages(self, checkpointer: TieredCheckpointer) -> list[str]:
+        return (await checkpointer.aget_tuple(self.thread)).checkpoint["channel_values"]["messages"]
+
+    async def test_strict_failed_put_is_not_cached(self):
+        checkpointer = await self.make_checkpointer(strict=True)
+        saved = await self.put(checkpointer, self.thread, ["q1", "a1"], 1)
+
+        self.saver.down = True
+        with self.assertRaises(ConnectionError):
+            await self.put(checkpointer, saved, ["q1", "a1", "q2", "a2"], 2)
+        self.saver.down = False
+
+        self.assertEqual(await self.cached_messages(checkpointer), ["q1", "a1"])
+
+    async def test_strict_failed_put_writes_is_not_cached(self):
+        checkpointer = await self.make_checkpointer(strict=True)
+        saved = await self.put(checkpointer, self.thread, ["q1"], 1)
+
+        self.saver.down = True
+        with self.assertRaises(ConnectionError):
+            await checkpointer.aput_writes(saved, [("messages", "lost")], "task")
+        self.saver.down = False
+
+        self.assertEqual((await checkpointer.aget_tuple(self.thread)).pending_writes, [])
+
+    async def test_write_behind_failure_drops_the_cached_thread(self):
+        checkpointer = await self.make_checkpointer(strict=False)
+        saved = await self.put(checkpointer, self.thread, ["q1", "a1"], 1)
+        await checkpointer.stop()
+        await checkpointer.start()
+
+        self.saver.down = True
+        await self.put(checkpointer, saved, ["q1", "a1", "q2", "a2"], 2)
+        await checkpointer.stop()
+        self.saver.down = False
+
+        self.assertEqual(await self.cached_messages(checkpointer), ["q1", "a1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from src.agent.context import count_tokens, token_count_cache
+from src.agent.nodes import _to_langchain
+from src.db.model.message import Message, MessageRole
+
+
+class HistoryTokenCountTest(unittest.TestCase):
+    def setUp(self) -> None:
+        token_count_cache.clear()
+
+    def test_rebuilt_history_reuses_cached_counts(self):
+        rows = [
+            Message(id=1, chat_id=1, text="Where is my order?", client_name="john", role=MessageRole.CLIENT),
+            Message(id=2, chat_id=1, text="It ships tomorrow.", role=MessageRole.AGENT),
+        ]
+
+        first = [count_tokens(_to_langchain(row)) for row in rows]
+        second = [count_tokens(_to_langchain(row)) for row in rows]
+
+        self.assertEqual(first, second)
+        self.assertEqual(len(token_count_cache), len(rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
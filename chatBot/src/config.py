@@ -4,6 +4,18 @@ import os
 WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "http://localhost:8001")
 
 # Backend API URLs
-BACKEND_CHAT_API_URL = "http://backend:8000/api/v1/agent/chat/"
-BACKEND_AGENTS_API_URL = "http://backend:8000/api/v1/agent/"
+BACKEND_URL = os.getenv("BACKEND_URL", "http://backend:8000")
+BACKEND_CHAT_API_URL = f"{BACKEND_URL}/api/v1/agent/chat/"
+BACKEND_AGENTS_API_URL = f"{BACKEND_URL}/api/v1/agent/"
+BACKEND_CHAT_ASYNC_API_URL = f"{BACKEND_URL}/api/v1/agent/chat/async/"
 
+# Telegram Bot API (pode apontar para um servidor local em testes de carga)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+# Async mode: the backend replies through a callback instead of holding the request open
+# (the callback URL, /agent/reply, is configured in the backend as CHAT_JOB_CALLBACK_URL)
+ASYNC_CHAT_ENABLED = os.getenv("ASYNC_CHAT_ENABLED", "false").lower() in ("1", "true", "yes")
+# Shared with the backend (CHAT_JOB_CALLBACK_SECRET); callbacks without it are rejected
+CHAT_CALLBACK_SECRET = os.getenv("CHAT_CALLBACK_SECRET", "")
+# Seconds a submitted job waits for its callback before it is forgotten
+CHAT_JOB_TTL = float(os.getenv("CHAT_JOB_TTL", "3600"))
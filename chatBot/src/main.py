@@ -1,12 +1,21 @@
+import hmac
+
 import httpx
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 
-from .schemas import Update, AgentWebhookPayload
-from .config import BACKEND_CHAT_API_URL
+from .schemas import Update, AgentWebhookPayload, ChatJobResult
+from .config import (
+    BACKEND_CHAT_API_URL,
+    BACKEND_CHAT_ASYNC_API_URL,
+    ASYNC_CHAT_ENABLED,
+    CHAT_CALLBACK_SECRET,
+)
 from .utils import (
     agent_registry,
     get_agent,
     send_telegram_message,
+    track_job,
+    take_job,
     load_all_active_agents,
     handle_agent_created,
     handle_agent_deleted,
@@ -55,6 +64,9 @@ async def telegram_webhook(agent_id: int, update: Update):
         }
     } 
 
+    if ASYNC_CHAT_ENABLED:
+        return await submit_async_chat(agent_info, chat_id, payload)
+
     ia_resposta = "Não foi possível obter uma resposta da IA."
 
     async with httpx.AsyncClient(timeout=30.0) as client:
@@ -62,6 +74,10 @@ async def telegram_webhook(agent_id: int, update: Update):
             response = await client.post(BACKEND_CHAT_API_URL, json=payload)
             response.raise_for_status()
             ia_response_data = response.json()
+            if ia_response_data.get("coalesced"):
+                # Respondida junto com uma mensagem seguinte do mesmo chat
+                print(f"Mensagem do chat ID {chat_id} agrupada com a próxima, sem resposta própria")
+                return {"status": "coalesced"}
             ia_resposta = ia_response_data.get("response", "A IA não respondeu claramente, mas o status foi 200 OK.")
         except httpx.HTTPStatusError as e:
             print(f"ERRO API BACKEND {e.response.status_code}: {e.response.text}")
@@ -93,6 +109,58 @@ async def telegram_webhook(agent_id: int, update: Update):
     return {"status": "success", "response_sent": ia_resposta}
 
 
+async def submit_async_chat(agent_info: dict, chat_id: int, payload: dict):
+    """Envia a mensagem ao backend em modo assíncrono; a resposta chega em /agent/reply."""
+    async with httpx.AsyncClient(timeout=5.0) as client:
+        try:
+            response = await client.post(BACKEND_CHAT_ASYNC_API_URL, json=payload)
+            response.raise_for_status()
+            job = response.json()
+            track_job(job["id"], payload["chat"]["agent_id"], chat_id)
+            print(f"Mensagem do chat ID {chat_id} aceita pelo backend, job {job.get('id')}")
+            return {"status": "accepted", "job_id": job.get("id")}
+        except httpx.HTTPStatusError as e:
+            print(f"ERRO API BACKEND {e.response.status_code}: {e.response.text}")
+            ia_resposta = f"Erro no serviço de IA: Status {e.response.status_code}."
+        except httpx.RequestError:
+            print("ERRO CONEXÃO BACKEND")
+            ia_resposta = "Erro de conexão com o serviço de IA."
+
+    await send_telegram_message(agent_info["token"], chat_id, ia_resposta)
+    return {"status": "error", "response_sent": ia_resposta}
+
+
+@app.post("/agent/reply")
+async def agent_reply_webhook(result: ChatJobResult, x_callback_secret: str | None = Header(default=None)):
+    """Endpoint que recebe do backend a resposta de um job assíncrono e a envia ao Telegram."""
+    if not CHAT_CALLBACK_SECRET or not hmac.compare_digest(
+        (x_callback_secret or "").encode(), CHAT_CALLBACK_SECRET.encode()
+    ):
+        print(f"Callback do job {result.job_id} rejeitado: segredo inválido")
+        raise HTTPException(status_code=401, detail="Invalid callback secret")
+
+    # Only jobs submitted by this process are answered. A callback that beats the
+    # submit response is retried by the backend, by which time the job is tracked.
+    job = take_job(result.job_id)
+    if not job:
+        print(f"Job {result.job_id} desconhecido ou já respondido")
+        raise HTTPException(status_code=404, detail="Unknown job")
+    agent_id, chat_id = job
+
+    agent_info = get_agent(agent_id)
+    if not agent_info:
+        print(f"Agent {agent_id} não encontrado no registro (job {result.job_id})")
+        return {"message": "Agent not found", "status": "error"}
+
+    if result.coalesced:
+        print(f"Job {result.job_id} agrupado com a próxima mensagem do chat {chat_id}, sem resposta própria")
+        return {"status": "coalesced", "job_id": result.job_id}
+
+    ia_resposta = result.response or "A IA não respondeu claramente."
+    await send_telegram_message(agent_info["token"], chat_id, ia_resposta)
+    return {"status": "success", "job_id": result.job_id, "response_sent": ia_resposta}
+
+
 @app.post("/agent/event")
 async def agent_event_webhook(payload: AgentWebhookPayload):
     """Endpoint to receive agent creation/deletion events from the backend."""
@@ -38,3 +38,15 @@ class AgentWebhookPayload(BaseModel):
     event: str  # 'created' or 'deleted'
     agent: AgentEvent
 
+
+class ChatReference(BaseModel):
+    id: int
+    agent_id: int
+
+
+class ChatJobResult(BaseModel):
+    job_id: str
+    status: str  # 'done' or 'failed'
+    response: str | None = None
+    coalesced: bool = False  # True when the answer goes to a later message of the chat
+    chat: ChatReference
@@ -1,23 +1,45 @@
-from typing import Dict, Union
+import time
+from typing import Dict, Tuple, Union
 import httpx
-from .config import WEBHOOK_BASE_URL, BACKEND_AGENTS_API_URL
+from .config import WEBHOOK_BASE_URL, BACKEND_AGENTS_API_URL, TELEGRAM_API_URL, CHAT_JOB_TTL
 
 
 # Agent Registry: Store agent tokens and metadata
 agent_registry: Dict[int, Dict[str, Union[str, int, bool]]] = {}
 
+# Async jobs submitted to the backend and not answered yet: job_id -> (agent_id, chat_id, submitted_at)
+pending_jobs: Dict[str, Tuple[int, int, float]] = {}
+
 
 def get_agent(agent_id: int) -> Dict[str, Union[str, int, bool]] | None:
     """Get agent information from registry."""
     return agent_registry.get(agent_id)
 
 
+def track_job(job_id: str, agent_id: int, chat_id: int):
+    """Registra um job enviado ao backend; /agent/reply só aceita jobs registrados."""
+    now = time.monotonic()
+    # Jobs are kept in submission order, so the expired ones are at the front
+    while pending_jobs:
+        oldest = next(iter(pending_jobs))
+        if now - pending_jobs[oldest][2] < CHAT_JOB_TTL:
+            break
+        del pending_jobs[oldest]
+    pending_jobs[job_id] = (agent_id, chat_id, now)
+
+
+def take_job(job_id: str) -> Tuple[int, int] | None:
+    """Remove um job do registro e retorna (agent_id, chat_id), ou None se não foi enviado por este processo."""
+    job = pending_jobs.pop(job_id, None)
+    return job[:2] if job else None
+
+
 async def send_telegram_message(token: str, chat_id: int, text: str):
     """Envia uma mensagem de volta para o Telegram usando o token específico do bot."""
     async with httpx.AsyncClient() as client:
         try:
             response = await client.post(
-                f"https://api.telegram.org/bot{token}/sendMessage",
+                f"{TELEGRAM_API_URL}/bot{token}/sendMessage",
                 json={"chat_id": chat_id, "text": text}
             )
             response.raise_for_status()
@@ -40,7 +62,7 @@ async def register_telegram_webhook(token: str, agent_id: int):
     async with httpx.AsyncClient() as client:
         try:
             response = await client.post(
-                f"https://api.telegram.org/bot{token}/setWebhook",
+                f"{TELEGRAM_API_URL}/bot{token}/setWebhook",
                 json={"url": webhook_url}
             )
             result = response.json()
@@ -60,7 +82,7 @@ async def unregister_telegram_webhook(token: str):
     async with httpx.AsyncClient() as client:
         try:
             response = await client.post(
-                f"https://api.telegram.org/bot{token}/deleteWebhook",
+                f"{TELEGRAM_API_URL}/bot{token}/deleteWebhook",
                 json={"drop_pending_updates": True}
             )
             result = response.json()